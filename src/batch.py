@@ -0,0 +1,119 @@
+from data import *
+from crystal import *
+from sweep import *
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+def find_setting(root_dir):
+    """
+    Find every case folder (folder that contains setting.csv) under the root directory
+    
+    :param root_dir: root directory
+    :type root_dir: string
+    :return: list of case folders, ended with "/"
+    :rtype: list
+    """
+    
+    output=[]
+    for path,folder_list,file_list in os.walk(root_dir):
+        folder_list.sort()
+        if "setting.csv" in file_list:
+            output.append(os.path.join(path,""))
+    return output
+
+def run_case(setting_dir,CSD_mesh_size):
+    """
+    Solve one case folder and export the result to its Result folder. The error is caught, so one failed case doesn't stop the others
+    
+    :param setting_dir: case folder, ended with "/"
+    :type setting_dir: string
+    :param CSD_mesh_size: mesh size of the exported CSD (um)
+    :type CSD_mesh_size: float
+    :return: case folder, status, growth rate, nucleation rate and G*tau
+    :rtype: list
+    """
+    
+    try:
+        os.makedirs(setting_dir+"Result",exist_ok=True)
+        tmp1=crystal()
+        tmp1.read_setting(setting_dir+"setting.csv")
+        tmp1.solve()
+        tmp1.output(setting_dir,CSD_mesh_size)
+        G=float(np.ravel(tmp1.G)[0])
+        B=float(np.ravel(tmp1.B)[0])
+        output=[setting_dir,"success",G,B,G*tmp1.tau]
+    except Exception as error:
+        output=[setting_dir,"failed: "+repr(error),np.nan,np.nan,np.nan]
+    return output
+
+def run_all(root_dir,CSD_mesh_size,worker_number=None):
+    """
+    Solve every case folder under the root directory with a process pool and export summary.csv to the root directory
+    
+    :param root_dir: root directory
+    :type root_dir: string
+    :param CSD_mesh_size: mesh size of the exported CSD (um)
+    :type CSD_mesh_size: float
+    :param worker_number: number of worker processes. If None, the number of CPUs is used
+    :type worker_number: int
+    :return: summary of all cases
+    :rtype: list
+    """
+    
+    case_list=find_setting(root_dir)
+    with ProcessPoolExecutor(max_workers=worker_number) as executor:
+        result=list(executor.map(run_case,case_list,[CSD_mesh_size]*len(case_list)))
+    
+    case=variable("case","-",[])
+    status=variable("status","-",[])
+    G=variable("growth rate","um/min",[])
+    B=variable("nucleation rate","1/(um^3*min)",[])
+    G_tau=variable("G*tau","um",[])
+    for x in result:
+        case.value.append(os.path.relpath(x[0],root_dir))
+        status.value.append(x[1])
+        G.value.append(x[2])
+        B.value.append(x[3])
+        G_tau.value.append(x[4])
+    output=[case,status,G,B,G_tau]
+    variable_output(output,os.path.join(root_dir,"summary.csv"))
+    
+    failed_number=len(result)-status.value.count("success")
+    print(str(len(result))+" cases solved, "+str(failed_number)+" failed")
+    return output
+
+def solve_table(setting_file,result_file,base=None,chunk_size=10000):
+    """
+    Solve every case of the multi-case setting table (one case per row) and append the results to one csv file. The table is read, solved and exported chunk by chunk
+    
+    :param setting_file: csv file of the setting table
+    :type setting_file: string
+    :param result_file: csv file of the results
+    :type result_file: string
+    :param base: crystal that provides the parameters not in the table
+    :type base: crystal
+    :param chunk_size: number of cases solved at a time
+    :type chunk_size: int
+    :return: number of cases and number of failed cases
+    :rtype: int
+    """
+    
+    case_number=0
+    failed_number=0
+    for parameters in setting_table_chunk(setting_file,chunk_size,base):
+        tmp1=crystal_sweep(parameters)
+        tmp1.solve()
+        with np.errstate(over="ignore",invalid="ignore",divide="ignore"):
+            L50=tmp1.size_quantile(0.5)
+            CV=tmp1.size_statistics("volume")[1]
+        output=[variable("case","-",np.arange(case_number,case_number+tmp1.case_number)+1)]
+        output.extend(tmp1.result())
+        output.append(variable("G*tau","um",tmp1.G*tmp1.tau))
+        output.append(variable("L50 (volume)","um",L50))
+        output.append(variable("CV (volume)","%",CV))
+        variable_stream_output(output,result_file,append=case_number>0)
+        case_number=case_number+tmp1.case_number
+        failed_number=failed_number+int(np.sum(np.isnan(tmp1.G)))
+    
+    print(str(case_number)+" cases solved, "+str(failed_number)+" failed")
+    return case_number,failed_number
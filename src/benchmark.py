@@ -0,0 +1,211 @@
+from batch import *
+import json
+import platform
+import tempfile
+import tracemalloc
+from time import perf_counter
+from datetime import datetime
+
+def measure(function,repeat=3):
+    """
+    Measure the wall time and peak memory of the function. The wall time is the best of the repeated runs, and the peak memory is traced in one extra run, so the tracing doesn't slow down the timed runs
+
+    :param function: function without argument
+    :type function: function
+    :param repeat: number of timed runs
+    :type repeat: int
+    :return: wall time (s) and peak memory (byte)
+    :rtype: dict
+    """
+
+    time_list=[]
+    for k in range(repeat):
+        start=perf_counter()
+        function()
+        time_list.append(perf_counter()-start)
+    tracemalloc.start()
+    function()
+    peak=tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"time":min(time_list),"memory":peak}
+
+def scaling_exponent(size_list,time_list):
+    """
+    Fit time ~ size^exponent on the log-log scale, e.g. 1 for linear scaling
+
+    :param size_list: problem size
+    :type size_list: list
+    :param time_list: wall time (s)
+    :type time_list: list
+    :return: exponent, None if there are less than two sizes
+    :rtype: float
+    """
+
+    if len(size_list)<2:
+        return None
+    return float(np.polyfit(np.log(size_list),np.log(np.maximum(time_list,1e-9)),1)[0])
+
+def benchmark_add(result,name,size,function,repeat):
+    """
+    Measure the function and append the wall time and peak memory to the scaling curve of the benchmark
+
+    :param result: benchmark result
+    :type result: dict
+    :param name: benchmark name
+    :type name: string
+    :param size: problem size (number of mesh points or cases)
+    :type size: int
+    :param function: function without argument
+    :type function: function
+    :param repeat: number of timed runs
+    :type repeat: int
+    """
+
+    tmp1=measure(function,repeat)
+    if name not in result:
+        result[name]={"size":[],"time":[],"memory":[]}
+    result[name]["size"].append(int(size))
+    result[name]["time"].append(tmp1["time"])
+    result[name]["memory"].append(tmp1["memory"])
+    print(name+" (size "+str(size)+"): "+format(tmp1["time"],".4g")+" s, "+format(tmp1["memory"]/2**20,".4g")+" MiB")
+
+def benchmark(setting_dir,mesh_list=[1,0.1,0.01],case_list=[1000,10000,100000],repeat=3):
+    """
+    Run the benchmark suite on the example case. crystal.solve is timed on the example itself, DF_to_NF, moment_calculation, variable_output and variable_read are timed on the product PDF of the example generated on each mesh size, and crystal_sweep is timed on residence time sweeps of each case number
+
+    :param setting_dir: case folder, ended with "/"
+    :type setting_dir: string
+    :param mesh_list: mesh sizes of the synthetic PDF (um)
+    :type mesh_list: list
+    :param case_list: case numbers of the sweep
+    :type case_list: list
+    :param repeat: number of timed runs
+    :type repeat: int
+    :return: environment and the scaling curve (size, wall time and peak memory) of each benchmark
+    :rtype: dict
+    """
+
+    base=crystal()
+    base.read_setting(setting_dir+"setting.csv")
+    result={}
+
+    benchmark_add(result,"read_setting",1,lambda: crystal().read_setting(setting_dir+"setting.csv"),repeat)
+    benchmark_add(result,"solve (fsolve)",1,lambda: base.solve("fsolve"),repeat)
+    benchmark_add(result,"solve (newton)",1,lambda: base.solve("newton"),repeat)
+    base.solve()
+
+    with tempfile.TemporaryDirectory() as folder:
+        # the csv and npz files are kept in separate folders, so variable_read never switches the csv to the npz sidecar
+        os.mkdir(os.path.join(folder,"csv"))
+        os.mkdir(os.path.join(folder,"npz"))
+        csv_file=os.path.join(folder,"csv","PDF.csv")
+        npz_file=os.path.join(folder,"npz","PDF.npz")
+        for mesh_size in mesh_list:
+            size,density_function=base.PDF_mesh(mesh_size)
+            number=len(size.value)
+            benchmark_add(result,"DF_to_NF",number,lambda: DF_to_NF(size,density_function,mesh_size),repeat)
+            benchmark_add(result,"moment_calculation",number,lambda: moment_calculation(size.value,density_function.value,3),repeat)
+            benchmark_add(result,"variable_output",number,lambda: variable_output([size,density_function],csv_file),repeat)
+            benchmark_add(result,"variable_read (csv)",number,lambda: variable_read(csv_file),repeat)
+            variable_binary_output([size,density_function],npz_file)
+            benchmark_add(result,"variable_read (npz)",number,lambda: variable_read(npz_file),repeat)
+
+    for case_number in case_list:
+        parameters={"tau":np.linspace(0.5,2,case_number)*base.tau}
+        benchmark_add(result,"crystal_sweep",case_number,lambda: crystal_sweep(parameters,base).solve(),repeat)
+
+    for name in result:
+        result[name]["exponent"]=scaling_exponent(result[name]["size"],result[name]["time"])
+
+    output={}
+    output["date"]=datetime.now().isoformat(timespec="seconds")
+    output["python"]=platform.python_version()
+    output["numpy"]=np.__version__
+    output["machine"]=platform.machine()
+    output["benchmark"]=result
+    return output
+
+def benchmark_save(result,file):
+    """
+    Save the benchmark result as the JSON baseline
+
+    :param result: benchmark result
+    :type result: dict
+    :param file: JSON file
+    :type file: string
+    """
+
+    with open(file,"w") as f:
+        json.dump(result,f,indent=2)
+
+def benchmark_load(file):
+    """
+    Load the JSON baseline
+
+    :param file: JSON file
+    :type file: string
+    :return: benchmark result
+    :rtype: dict
+    """
+
+    with open(file) as f:
+        return json.load(f)
+
+def benchmark_compare(result,baseline,threshold=1.25):
+    """
+    Compare the benchmark result with the baseline at the same problem sizes and print the ratio of wall time and peak memory
+
+    :param result: benchmark result
+    :type result: dict
+    :param baseline: baseline benchmark result
+    :type baseline: dict
+    :param threshold: ratio above which the benchmark is reported as a regression
+    :type threshold: float
+    :return: regressions as [name, size, quantity, ratio]
+    :rtype: list
+    """
+
+    output=[]
+    print("baseline: "+baseline["date"]+", python "+baseline["python"]+", numpy "+baseline["numpy"])
+    for name in result["benchmark"]:
+        if name not in baseline["benchmark"]:
+            print(name+": not in baseline")
+            continue
+        tmp1=result["benchmark"][name]
+        tmp2=baseline["benchmark"][name]
+        for k in range(len(tmp1["size"])):
+            if tmp1["size"][k] not in tmp2["size"]:
+                continue
+            index=tmp2["size"].index(tmp1["size"][k])
+            line=name+" (size "+str(tmp1["size"][k])+"):"
+            for quantity in ["time","memory"]:
+                ratio=tmp1[quantity][k]/max(tmp2[quantity][index],1e-12)
+                line=line+" "+quantity+" x"+format(ratio,".3g")
+                if ratio>threshold:
+                    output.append([name,tmp1["size"][k],quantity,ratio])
+                    line=line+" (regression)"
+            print(line)
+    return output
+
+# ===========================================
+
+setting_dir=r"../examples/ammonium alum/"
+mesh_list=[1,0.1,0.01] # um
+case_list=[1000,10000,100000] # cases of the sweep
+repeat=3 # timed runs of each benchmark
+baseline_file=r"../benchmark_baseline.json" # compared with if it exists, created otherwise
+threshold=1.25 # wall time or memory ratio reported as a regression
+
+# ===========================================
+
+if __name__=="__main__":
+    result=benchmark(setting_dir,mesh_list,case_list,repeat)
+    for name in result["benchmark"]:
+        if result["benchmark"][name]["exponent"] is not None:
+            print(name+": time ~ size^"+format(result["benchmark"][name]["exponent"],".3g"))
+    if os.path.exists(baseline_file):
+        regression=benchmark_compare(result,benchmark_load(baseline_file),threshold)
+        print(str(len(regression))+" regression(s)")
+    else:
+        benchmark_save(result,baseline_file)
+        print("baseline saved to "+baseline_file)
@@ -0,0 +1,97 @@
+import collections
+import shelve
+
+class solve_cache:
+    """
+    Module used to memorize the solved results of crystal.solve, keyed on the exact tuple of the parameters in setting_list.
+    The least recently used result is dropped when the cache is full, and the results can also be kept in a file (shelve) that persists between runs
+    """
+    
+    def __init__(self,max_size=1024,file=None):
+        """
+        :param max_size: maximum number of results kept in memory
+        :type max_size: int
+        :param file: file of the persistent cache. If None, the results are only kept in memory
+        :type file: string
+        """
+        
+        self.max_size=max_size
+        self.entry=collections.OrderedDict()
+        self.file=None
+        if file is not None:
+            self.file=shelve.open(file)
+        self.hit=0
+        self.miss=0
+        self.saved_time=0.0 # solver time saved by the hits (s)
+    
+    def get(self,key):
+        """
+        Return the result of the parameters, or None if it's not in the cache
+        
+        :param key: parameters in the order of setting_list
+        :type key: tuple
+        :return: solved result
+        :rtype: dict
+        """
+        
+        if key in self.entry:
+            self.entry.move_to_end(key)
+            result,solve_time=self.entry[key]
+        elif self.file is not None and repr(key) in self.file:
+            result,solve_time=self.file[repr(key)]
+            self.store(key,result,solve_time)
+        else:
+            self.miss=self.miss+1
+            return None
+        self.hit=self.hit+1
+        self.saved_time=self.saved_time+solve_time
+        return result
+    
+    def put(self,key,result,solve_time):
+        """
+        Add the solved result to the cache (and the file)
+        
+        :param key: parameters in the order of setting_list
+        :type key: tuple
+        :param result: solved result
+        :type result: dict
+        :param solve_time: time spent by the solve (s)
+        :type solve_time: float
+        """
+        
+        self.store(key,result,solve_time)
+        if self.file is not None:
+            self.file[repr(key)]=(result,solve_time)
+    
+    def store(self,key,result,solve_time):
+        """
+        Add the result to memory and drop the least recently used one if the cache is full
+        """
+        
+        self.entry[key]=(result,solve_time)
+        self.entry.move_to_end(key)
+        while len(self.entry)>self.max_size:
+            self.entry.popitem(last=False)
+    
+    def summary(self):
+        """
+        Print and return the number of hits and misses and the saved solver time
+        
+        :return: hit, miss and saved time (s)
+        """
+        
+        total=self.hit+self.miss
+        hit_rate=self.hit/total*100 if total!=0 else 0
+        print("Cache hit: "+str(self.hit)+" ("+str(hit_rate)+" %)")
+        print("Cache miss: "+str(self.miss))
+        print("Saved solver time: "+str(self.saved_time)+" s")
+        return self.hit,self.miss,self.saved_time
+    
+    def close(self):
+        """
+        Close the file of the persistent cache
+        """
+        
+        if self.file is not None:
+            self.file.close()
+            self.file=None
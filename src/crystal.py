@@ -2,7 +2,24 @@ from data import *
 from figure import *
 from utility import *
 import numpy as np
+import os
+import copy
 from scipy.optimize import fsolve
+from time import perf_counter
+
+# attribute name, parameter name in setting.csv and unit of the crystallizer parameters
+setting_list=[
+    ["k","shape factor","-"],
+    ["rho","crystal density","kg/m3"],
+    ["Kr","Kr","-"],
+    ["j","j","-"],
+    ["i","i","-"],
+    ["tau","residence time","min"],
+    ["MT","slurry concentration","kg/m3"],
+    ["R","R","-"],
+    ["Lf","Lf","um"],
+    ["z","z","-"],
+    ["Lp","Lp","um"]]
 
 class CSD:
     """
@@ -25,28 +42,135 @@ class PDF:
 class crystal:
 
     def read_setting(self,file):
-        tmp1=parameter_read(file)
-        self.k=get_variable(tmp1,"shape factor").value[0]
-        self.rho=get_variable(tmp1,"crystal density").value[0]
-        self.Kr=get_variable(tmp1,"Kr").value[0]
-        self.j=get_variable(tmp1,"j").value[0]
-        self.i=get_variable(tmp1,"i").value[0]
-        self.tau=get_variable(tmp1,"residence time").value[0]
-        self.MT=get_variable(tmp1,"slurry concentration").value[0]
-        self.R=get_variable(tmp1,"R").value[0]
-        self.Lf=get_variable(tmp1,"Lf").value[0]
-        self.z=get_variable(tmp1,"z").value[0]
-        self.Lp=get_variable(tmp1,"Lp").value[0]
-
-    def nucleation(self,G):
+        tmp1=parameter_set(file)
+        for attribute,name,unit in setting_list:
+            setattr(self,attribute,tmp1.value(name,unit))
+
+    def nucleation(self,G,MT=None):
+        if MT is None:
+            MT=self.MT
         G_used=G*1e-6/60 # um/min to m/s
-        B=self.Kr*(self.MT**self.j)*(G_used**self.i)*1000*1e-18*60 # 1/L*s to 1/um^3*min
+        B=self.Kr*(MT**self.j)*(G_used**self.i)*1000*1e-18*60 # 1/L*s to 1/um^3*min
         return B
     
     def integral(self,G,tau,L):
         output=-G*tau*(L**3+3*(G*tau)*L**2+6*(G*tau)**2*L+6*(G*tau)**3)*np.exp(-L/G/tau)
         return output
     
+    def integral_moment(self,G,tau,L,order):
+        """
+        Antiderivative of L^order*exp(-L/G/tau), which gives the closed-form moments of each section of the PDF
+        
+        :param G: growth rate (um/min)
+        :type G: float
+        :param tau: residence time of the section (min)
+        :type tau: float
+        :param L: crystal size (um), np.inf is allowed
+        :type L: float
+        :param order: moment order
+        :type order: int
+        :return: value of the antiderivative
+        :rtype: float
+        """
+        
+        a=G*tau
+        L=np.asarray(L,dtype=float)
+        tmp1=0
+        factor=1 # order!/m!
+        for m in range(order,-1,-1):
+            tmp1=tmp1+factor*a**(order-m)*np.where(np.isinf(L),0,L)**m
+            factor=factor*m
+        output=np.where(np.isinf(L),0,-a*tmp1*np.exp(-L/a))
+        return output
+    
+    def moment(self,order,L1=0,L2=np.inf,product=True):
+        """
+        Closed-form moment of the PDF between L1 and L2. The crystallizer has to be solved first
+        
+        :param order: moment order
+        :type order: int
+        :param L1: lower bound of crystal size (um)
+        :type L1: float
+        :param L2: upper bound of crystal size (um)
+        :type L2: float
+        :param product: if True, the PDF exported by output is used. Otherwise, the PDF inside the crystallizer is used (no z factor in the third section)
+        :type product: bool
+        :return: moment
+        :rtype: float
+        """
+        
+        if product:
+            C3=self.C3*self.z
+        else:
+            C3=self.C3
+        section_list=[[self.C1,self.tau/self.R,0,self.Lf],[self.C2,self.tau,self.Lf,self.Lp],[C3,self.tau/self.z,self.Lp,np.inf]]
+        
+        output=0
+        for C,tau,lower,upper in section_list:
+            tmp1=np.clip(L1,lower,upper)
+            tmp2=np.clip(L2,lower,upper)
+            output=output+C*(self.integral_moment(self.G,tau,tmp2,order)-self.integral_moment(self.G,tau,tmp1,order))
+        return output
+    
+    def size_statistics(self,type="number"):
+        """
+        Mean size and coefficient of variation of the product PDF from the closed-form moments
+        
+        :param type: "number" for number-based (L10) or "volume" for volume-based (L43) statistics
+        :type type: string
+        :return: mean size (um) and CV (%)
+        :rtype: float
+        """
+        
+        if type=="number":
+            order=0
+        elif type=="volume":
+            order=3
+        else:
+            raise ValueError("type should be number or volume")
+        m0=self.moment(order)
+        m1=self.moment(order+1)
+        m2=self.moment(order+2)
+        mean=m1/m0
+        CV=np.sqrt(m2*m0/m1**2-1)*100
+        return mean,CV
+    
+    def size_quantile(self,fraction,type="volume"):
+        """
+        Size below which the given fraction of the product PDF lies (e.g. fraction=0.5 for the median size), by bisection on the closed-form cumulative distribution.
+        It also works for the array parameters of crystal_sweep
+        
+        :param fraction: cumulative fraction
+        :type fraction: float
+        :param type: "number" or "volume"
+        :type type: string
+        :return: size (um)
+        :rtype: float
+        """
+        
+        if type=="number":
+            order=0
+        elif type=="volume":
+            order=3
+        else:
+            raise ValueError("type should be number or volume")
+        target=fraction*self.moment(order)
+        
+        L_low=np.zeros(np.shape(target))
+        L_high=np.ones(np.shape(target))*self.G*self.tau
+        for x in range(100):
+            tmp1=self.moment(order,0,L_high)<target
+            if not np.any(tmp1):
+                break
+            L_low=np.where(tmp1,L_high,L_low)
+            L_high=np.where(tmp1,L_high*2,L_high)
+        for x in range(60):
+            L=(L_low+L_high)/2
+            tmp1=self.moment(order,0,L)<target
+            L_low=np.where(tmp1,L,L_low)
+            L_high=np.where(tmp1,L_high,L)
+        return (L_low+L_high)/2
+    
     def slurry_concentration(self,G):
         n=self.nucleation(G)/G
         third_moment=0
@@ -68,69 +192,280 @@ class crystal:
         output=self.slurry_concentration(G)-self.MT
         return output
     
-    def solve(self):
-        G=fsolve(self.material_balance,[10])
+    def slurry_concentration_derivative(self,G):
+        """
+        Analytic derivative of slurry_concentration with respect to growth rate
+        
+        :param G: growth rate (um/min)
+        :type G: float
+        :return: derivative (kg/m3/(um/min))
+        :rtype: float
+        """
+        
+        # each section contributes C*J, where C is the coefficient and J the third moment integral of the section
+        # d(C*J)/dG=C*(dlnC/dG*J+dJ/dG), and dJ/dG=J4/(G*a), where J4 is the fourth moment integral and a=G*tau of the section
+        n=self.nucleation(G)/G
+        derivative=0
+
+        C1=n
+        dlnC1=(self.i-1)/G
+        a=G*self.tau/self.R
+        J=self.integral_moment(G,self.tau/self.R,self.Lf,3)-self.integral_moment(G,self.tau/self.R,0,3)
+        dJ=(self.integral_moment(G,self.tau/self.R,self.Lf,4)-self.integral_moment(G,self.tau/self.R,0,4))/G/a
+        derivative=C1*(dlnC1*J+dJ)+derivative
+
+        C2=C1*np.exp(-self.Lf/self.tau/G*(self.R-1))
+        dlnC2=dlnC1+self.Lf*(self.R-1)/self.tau/G**2
+        a=G*self.tau
+        J=self.integral_moment(G,self.tau,self.Lp,3)-self.integral_moment(G,self.tau,self.Lf,3)
+        dJ=(self.integral_moment(G,self.tau,self.Lp,4)-self.integral_moment(G,self.tau,self.Lf,4))/G/a
+        derivative=C2*(dlnC2*J+dJ)+derivative
+
+        C3=C2*np.exp(-self.Lp/self.tau/G*(1-self.z))
+        dlnC3=dlnC2+self.Lp*(1-self.z)/self.tau/G**2
+        a=G*self.tau/self.z
+        J=self.integral_moment(G,self.tau/self.z,10000,3)-self.integral_moment(G,self.tau/self.z,self.Lp,3)
+        dJ=(self.integral_moment(G,self.tau/self.z,10000,4)-self.integral_moment(G,self.tau/self.z,self.Lp,4))/G/a
+        derivative=C3*(dlnC3*J+dJ)*self.z+derivative
 
-        self.G=G
-        self.B=self.nucleation(G)
-        self.n=self.B/G
-        self.MT2=self.slurry_concentration(G)
-        self.C1=self.n
-        self.C2=self.C1*np.exp(-self.Lf/self.tau/self.G*(self.R-1))
-        self.C3=self.C2*np.exp(-self.Lp/self.tau/self.G*(1-self.z))
+        output=derivative*self.k*self.rho
 
-    def output(self,setting_dir,CSD_mesh_size):
+        return output
+    
+    def newton(self,guess,tolerance,max_iteration):
         """
-        Export the simulation result (PDF and CSD)
+        Bracketed Newton method on log(slurry concentration) versus log(growth rate), which is nearly linear since MT is proportional to G^(i+3) for MSMPR.
+        A bisection step is taken whenever the Newton step leaves the bracket of the physical root
+        
+        :param guess: initial guess of growth rate (um/min)
+        :type guess: float
+        :param tolerance: tolerance of log(MT2/MT)
+        :type tolerance: float
+        :param max_iteration: maximum number of iterations
+        :type max_iteration: int
+        :return: growth rate, number of evaluations and convergence flag
+        :rtype: narray, int, bool
         """
+        
+        u=np.log(guess)
+        u_low=-np.inf
+        u_high=np.inf
+        evaluation=0
+        with np.errstate(over="ignore",invalid="ignore",divide="ignore"):
+            for x in range(max_iteration):
+                G=np.exp(u)
+                MT=self.slurry_concentration(G)
+                evaluation=evaluation+1
+                phi=np.log(MT/self.MT)
+                # nan comes from the overflow of the exponential terms at very small growth rate
+                if np.isnan(phi) or phi<0:
+                    u_low=u
+                else:
+                    u_high=u
+                if abs(phi)<tolerance:
+                    return np.array([G]),evaluation,True
+                if u_high-u_low<1e-15:
+                    break
+                
+                slope=G*self.slurry_concentration_derivative(G)/MT
+                u_new=u-phi/slope
+                if not (u_new>u_low and u_new<u_high):
+                    if np.isinf(u_low):
+                        u_new=u_high-np.log(10)
+                    elif np.isinf(u_high):
+                        u_new=u_low+np.log(10)
+                    else:
+                        u_new=(u_low+u_high)/2
+                u=u_new
+        return np.array([np.exp(u)]),evaluation,False
+    
+    def solve(self,method="fsolve",guess=10,tolerance=1e-12,max_iteration=100,cache=None,residual_tolerance=1e-6):
+        """
+        Solve the material balance for growth rate. The number of material balance evaluations, the residual (kg/m3) and the convergence flag are stored as iteration, residual and converged.
+        The solve is converged only if the solver reports success and the relative residual |MT2-MT|/MT is within residual_tolerance
+        If a solve_cache is given, the result of the same parameters is taken from it without solving again
+        
+        :param method: "fsolve", or "newton" for the bracketed Newton method with analytic derivative
+        :type method: string
+        :param guess: initial guess of growth rate (um/min)
+        :type guess: float
+        :param tolerance: tolerance of log(MT2/MT), only used by newton
+        :type tolerance: float
+        :param max_iteration: maximum number of iterations, only used by newton
+        :type max_iteration: int
+        :param cache: cache of the solved results
+        :type cache: solve_cache
+        :param residual_tolerance: relative residual of the material balance accepted as converged
+        :type residual_tolerance: float
+        """
+        
+        if cache is not None:
+            key=tuple(float(getattr(self,x[0])) for x in setting_list)
+            result=cache.get(key)
+            if result is not None:
+                # the cached arrays are copied, so changing the crystal in place doesn't change the cache
+                for x in result:
+                    setattr(self,x,copy.deepcopy(result[x]))
+                self.iteration=0
+                return
+            start=perf_counter()
+        
+        # extreme parameters overflow the exponential terms, which is reported by converged and residual instead of warnings
+        with np.errstate(over="ignore",invalid="ignore",divide="ignore"):
+            if method=="fsolve":
+                G,info,flag,message=fsolve(self.material_balance,[guess],full_output=True)
+                self.iteration=info["nfev"]
+                self.converged=flag==1
+            elif method=="newton":
+                G,self.iteration,self.converged=self.newton(guess,tolerance,max_iteration)
+                if not self.converged:
+                    # fall back to fsolve from the last growth rate
+                    G,info,flag,message=fsolve(self.material_balance,G,full_output=True)
+                    self.iteration=self.iteration+info["nfev"]
+                    self.converged=flag==1
+            else:
+                raise ValueError("method should be fsolve or newton")
 
-        # initialize the size and density function
-        size_PDF=variable("size","$\mu m$",[])
-        density_function=variable("size","$1/\mu m^4$",[])
-
-        # generate CSD for the first section
-        number=int(self.Lf/CSD_mesh_size)+1
-        size_section1=array_to_list(np.linspace(0,self.Lf,number))
-        size_PDF.value.extend(size_section1)
+            self.G=G
+            self.B=self.nucleation(G)
+            self.n=self.B/G
+            self.MT2=self.slurry_concentration(G)
+            self.C1=self.n
+            self.C2=self.C1*np.exp(-self.Lf/self.tau/self.G*(self.R-1))
+            self.C3=self.C2*np.exp(-self.Lp/self.tau/self.G*(1-self.z))
+            self.residual=self.MT2-self.MT
+            self.converged=bool(self.converged and np.all(np.abs(self.residual)<=residual_tolerance*self.MT))
         
-        for i in range(len(size_section1)):
-            n=float(self.C1*np.exp(-size_section1[i]*self.R/self.G/self.tau))
-            density_function.value.append(n)
+        if cache is not None:
+            result={}
+            for x in ["G","B","n","MT2","C1","C2","C3","residual","converged"]:
+                result[x]=copy.deepcopy(getattr(self,x))
+            cache.put(key,result,perf_counter()-start)
 
-        # generate CSD for the second section
+    def continuation(self,parameter,value_list,extrapolation=True,tolerance=1e-12,max_iteration=100):
+        """
+        Solve a sequence of operating points where one parameter is stepped (e.g. startup ramp of residence time).
+        The converged growth rate of the previous point is the initial guess of the next one, or it's extrapolated linearly in log(G) from the previous two points.
+        The total number of material balance evaluations is stored as evaluation, and the crystal is left at the last point
+        
+        :param parameter: attribute name of the stepped parameter in setting_list (e.g. "tau" or "MT")
+        :type parameter: string
+        :param value_list: values of the stepped parameter
+        :type value_list: list
+        :param extrapolation: if True, the initial guess is extrapolated from the previous two points
+        :type extrapolation: bool
+        :param tolerance: tolerance of log(MT2/MT)
+        :type tolerance: float
+        :param max_iteration: maximum number of iterations of each point
+        :type max_iteration: int
+        :return: stepped parameter, growth rate, nucleation rate and MT2
+        :rtype: list
+        """
+        
+        name_list=[x[0] for x in setting_list]
+        name,unit=setting_list[name_list.index(parameter)][1:]
+        
+        value_list=np.asarray(value_list,dtype=float)
+        G=np.zeros(len(value_list))
+        B=np.zeros(len(value_list))
+        MT2=np.zeros(len(value_list))
+        converged=np.zeros(len(value_list),dtype=bool)
+        self.evaluation=0
+        guess=10
+        for x in range(len(value_list)):
+            setattr(self,parameter,value_list[x])
+            if x>=2 and extrapolation and value_list[x-1]!=value_list[x-2]:
+                slope=(np.log(G[x-1])-np.log(G[x-2]))/(value_list[x-1]-value_list[x-2])
+                guess=G[x-1]*np.exp(slope*(value_list[x]-value_list[x-1]))
+            elif x>=1:
+                guess=G[x-1]
+            self.solve("newton",guess,tolerance,max_iteration)
+            self.evaluation=self.evaluation+self.iteration
+            G[x]=self.G[0]
+            B[x]=self.B[0]
+            MT2[x]=self.MT2[0]
+            converged[x]=self.converged
+        
+        if not np.all(converged):
+            print("Not converged at "+name+"="+str(value_list[~converged].tolist()))
+        
+        output=[]
+        output.append(variable(name,unit,value_list))
+        output.append(variable("growth rate","um/min",G))
+        output.append(variable("nucleation rate","1/(um^3*min)",B))
+        output.append(variable("MT2","kg/m3",MT2))
+        return output
+    
+    def PDF_mesh(self,CSD_mesh_size):
+        """
+        Generate the product density function on the size mesh from 0 to 15*G*tau
+        
+        :param CSD_mesh_size: mesh size (um)
+        :type CSD_mesh_size: float
+        :return: size and density function
+        :rtype: variable
+        """
+        
+        # generate the size mesh of each section, the boundary points Lf and Lp belong to both neighboring sections
+        L_max=float(np.ravel(15*self.G*self.tau)[0])
+        number=int(self.Lf/CSD_mesh_size)+1
+        size_section1=np.linspace(0,self.Lf,number)
         number=int((self.Lp-self.Lf)/CSD_mesh_size)+1
-        size_section2=array_to_list(np.linspace(self.Lf,self.Lp,number))
-        size_PDF.value.extend(size_section2)
+        size_section2=np.linspace(self.Lf,self.Lp,number)
+        number=int((L_max-self.Lp)/CSD_mesh_size)+1
+        size_section3=np.linspace(self.Lp,L_max,number)
         
-        for i in range(len(size_section2)):
-            n=float(self.C2*np.exp(-size_section2[i]/self.G/self.tau))
-            density_function.value.append(n)
+        # generate the density function of each section in one pass
+        # the density function is continuous at Lf and jumps by the factor z at Lp
+        n_section1=self.C1*np.exp(-size_section1*self.R/self.G/self.tau)
+        n_section2=self.C2*np.exp(-size_section2/self.G/self.tau)
+        n_section3=self.C3*np.exp(-size_section3*self.z/self.G/self.tau)*self.z
+        
+        size_PDF=variable("size","$\mu m$",np.concatenate([size_section1,size_section2,size_section3]))
+        density_function=variable("size","$1/\mu m^4$",np.concatenate([n_section1,n_section2,n_section3]))
+        return size_PDF,density_function
 
-        # generate CSD for the third section
-        number=int((15*self.G*self.tau-self.Lp)/CSD_mesh_size)+1
-        size_section3=array_to_list(np.linspace(self.Lp,15*self.G*self.tau,number))
-        size_PDF.value.extend(size_section3)
+    def output(self,setting_dir,CSD_mesh_size,binary=False):
+        """
+        Export the simulation result (PDF and CSD)
         
-        for i in range(len(size_section3)):
-            n=float(self.C3*np.exp(-size_section3[i]*self.z/self.G/self.tau))*self.z
-            density_function.value.append(n)
+        :param setting_dir: case folder, ended with "/"
+        :type setting_dir: string
+        :param CSD_mesh_size: mesh size of the exported CSD (um)
+        :type CSD_mesh_size: float
+        :param binary: if True, the PDF and CSD are also exported to the binary result store (npz file next to each csv file). Otherwise, the result store of a previous run is removed
+        :type binary: bool
+        """
 
+        size_PDF,density_function=self.PDF_mesh(CSD_mesh_size)
         self.product_PDF=PDF(size_PDF,density_function)
 
 
         # export the PDF
         PDF_output=[self.product_PDF.size,self.product_PDF.density_function]
         variable_output(PDF_output,setting_dir+"Result/PDF.csv")
+        if binary:
+            variable_binary_output(PDF_output,setting_dir+"Result/PDF.npz",setting_dir+"Result/PDF.csv")
+        elif os.path.exists(setting_dir+"Result/PDF.npz"):
+            os.remove(setting_dir+"Result/PDF.npz") # the result store of the previous run is out of date
 
         # export the CSD
         mesh_size=CSD_mesh_size
         size,number_fraction=DF_to_NF(self.product_PDF.size,self.product_PDF.density_function,mesh_size)
         CSD_output=[size,number_fraction]
         variable_output(CSD_output,setting_dir+"Result/CSD(number).csv")
+        if binary:
+            variable_binary_output(CSD_output,setting_dir+"Result/CSD(number).npz",setting_dir+"Result/CSD(number).csv")
+        elif os.path.exists(setting_dir+"Result/CSD(number).npz"):
+            os.remove(setting_dir+"Result/CSD(number).npz") # the result store of the previous run is out of date
 
         size,volume_fraction=NF_to_VF(size,number_fraction)
         CSD_output=[size,volume_fraction]
         variable_output(CSD_output,setting_dir+"Result/CSD(volume).csv")
+        if binary:
+            variable_binary_output(CSD_output,setting_dir+"Result/CSD(volume).npz",setting_dir+"Result/CSD(volume).csv")
+        elif os.path.exists(setting_dir+"Result/CSD(volume).npz"):
+            os.remove(setting_dir+"Result/CSD(volume).npz") # the result store of the previous run is out of date
 
 
         # print the simulation result
@@ -1,6 +1,11 @@
 import numpy as np
 import csv
 import copy
+import collections
+import itertools
+import os
+import struct
+import zipfile
 from datetime import *
 
 def csv_input(file):
@@ -57,6 +62,170 @@ def string_float_transform(string):
 		bad_data_checker=1
 	return output,bad_data_checker
 	
+def csv_block_input(file):
+	"""
+	Read the csv file that has two header rows (name and unit) followed by the data block. The data block is split in bulk instead of row by row
+    
+	:param file: csv file name
+	:type file: string
+	:return: name list, unit list and the data block
+	:rtype: list, list, narray of string
+    
+	"""
+	
+	tmp=open(file,'r',newline='')
+	line_list=tmp.read().splitlines()
+	tmp.close()
+	while len(line_list)>2 and line_list[-1]=="":
+		line_list.pop()
+	header=list(csv.reader(line_list[:2]))
+	name_list=header[0]
+	unit_list=header[1]
+	body=line_list[2:]
+	block=csv_block_split(body,len(name_list))
+	return name_list,unit_list,block
+	
+def csv_block_split(line_list,column_number):
+	"""
+	Split the lines of the data block into a string array in bulk. IndexError is raised if any row doesn't have column_number cells
+    
+	:param line_list: lines of the data block
+	:type line_list: list
+	:param column_number: number of columns
+	:type column_number: int
+	:return: the data block
+	:rtype: narray of string
+    
+	"""
+	
+	text=",".join(line_list)
+	if '"' in text or any(x.count(",")!=column_number-1 for x in line_list):
+		# quoted or ragged rows are split by csv.reader and checked row by row
+		row_list=list(csv.reader(line_list))
+		for k in range(len(row_list)):
+			if len(row_list[k])!=column_number:
+				raise IndexError("row "+str(k+1)+" of the data block has "+str(len(row_list[k]))+" cells, "+str(column_number)+" expected")
+		cell=[x for row in row_list for x in row]
+	else:
+		cell=text.split(",") if len(line_list)>0 else []
+	block=np.array(cell,dtype=str).reshape(len(line_list),column_number)
+	return block
+	
+def csv_chunk_input(file,chunk_size):
+	"""
+	Read the csv file that has two header rows (name and unit) chunk by chunk, so the whole file is never kept in memory
+    
+	:param file: csv file name
+	:type file: string
+	:param chunk_size: number of rows of each chunk
+	:type chunk_size: int
+	:return: name list, unit list and the data block of each chunk
+	:rtype: generator
+    
+	"""
+	
+	tmp=open(file,'r',newline='')
+	header=list(csv.reader([tmp.readline(),tmp.readline()]))
+	name_list=header[0]
+	unit_list=header[1]
+	while True:
+		line_list=[x.rstrip("\r\n") for x in itertools.islice(tmp,chunk_size)]
+		while len(line_list)>0 and line_list[-1]=="":
+			line_list.pop()
+		if len(line_list)==0:
+			break
+		yield name_list,unit_list,csv_block_split(line_list,len(name_list))
+	tmp.close()
+	
+def string_array_float_transform(block):
+	"""
+	Vectorized string_float_transform. The strings that don't start with digit or "-" are transformed to 0 and marked as bad data
+	
+	:param block: the strings to be transformed
+	:type block: narray
+	:return: the float array and the bad data mask
+	:rtype: narray and narray
+	"""
+	
+	# character code of the first character of each string (0 for empty string)
+	code=block.astype("U1").view(np.int32)
+	valid=((code>=ord("0")) & (code<=ord("9"))) | (code==ord("-"))
+	output=np.zeros(block.shape)
+	output[valid]=block[valid].astype(float)
+	return output,~valid
+	
+def string_array_datetime_transform(block,date_form):
+	"""
+	Transform the strings to datetime64 in bulk. The fixed-width numeric fields (%Y, %m, %d, %H, %M, %S) are sliced directly, and the other formats are transformed by datetime.strptime
+	
+	:param block: the strings to be transformed
+	:type block: narray
+	:param date_form: the date format of the strings
+	:type date_form: string
+	:return: the datetime64 array
+	:rtype: narray
+	"""
+	
+	width={"Y":4,"m":2,"d":2,"H":2,"M":2,"S":2}
+	field={}
+	literal=[]
+	position=0
+	x=0
+	fixed_width=True
+	while x<len(date_form):
+		if date_form[x]=="%" and x+1<len(date_form):
+			if date_form[x+1] not in width:
+				fixed_width=False
+				break
+			field[date_form[x+1]]=position
+			position=position+width[date_form[x+1]]
+			x=x+2
+		else:
+			literal.append([position,date_form[x]])
+			position=position+1
+			x=x+1
+	
+	block=np.asarray(block,dtype=str)
+	if fixed_width and len(block)>0 and np.all(np.char.str_len(block)==position):
+		character=block.astype("U"+str(position)).view("U1").reshape(len(block),position)
+		digit=character.view(np.int32)-ord("0")
+		if all(np.all(character[:,y[0]]==y[1]) for y in literal):
+			number={"Y":1970,"m":1,"d":1,"H":0,"M":0,"S":0}
+			valid=True
+			for key in field:
+				tmp1=digit[:,field[key]:field[key]+width[key]]
+				if np.any((tmp1<0) | (tmp1>9)):
+					valid=False
+					break
+				number[key]=tmp1@(10**np.arange(width[key]-1,-1,-1))
+			if valid:
+				month=(np.asarray(number["Y"])-1970).astype("datetime64[Y]")+(np.asarray(number["m"])-1).astype("timedelta64[M]")
+				date=month.astype("datetime64[D]")+(np.asarray(number["d"])-1).astype("timedelta64[D]")
+				date=date+np.asarray(number["H"]).astype("timedelta64[h]")+np.asarray(number["M"]).astype("timedelta64[m]")+np.asarray(number["S"]).astype("timedelta64[s]")
+				date=np.broadcast_to(date,block.shape).astype("datetime64[us]")
+				# invalid fields (e.g. month 13, hour 25) don't pass the round trip and are left to strptime
+				if np.all(np.asarray(number["m"])>=1) and np.all(np.asarray(number["d"])>=1) and np.all(np.asarray(number["m"])<=12) and np.all(date.astype("datetime64[M]")==np.broadcast_to(month,block.shape)) and np.all(np.asarray(number["H"])<24) and np.all(np.asarray(number["M"])<60) and np.all(np.asarray(number["S"])<60):
+					return date
+	
+	return np.array([datetime.strptime(y,date_form) for y in block],dtype="datetime64[us]")
+	
+def bad_data_report(name_list,bad_data):
+	"""
+	Print the warning message and the number of bad data of each column
+	
+	:param name_list: name of each column
+	:type name_list: list
+	:param bad_data: bad data mask, one column per name
+	:type bad_data: narray
+	"""
+	
+	if np.any(bad_data):
+		print("Bad data detected(not float)")
+		count=np.sum(bad_data,axis=0)
+		for i in range(len(name_list)):
+			if count[i]!=0:
+				print("  "+name_list[i]+": "+str(count[i])+" bad data")
+	
 class variable:
 	"""
 	A class built for the variables that contain name and physical unit. It's defined through init function.
@@ -69,29 +238,102 @@ class variable:
 	
 def variable_read(file):
 	"""
-	Read the csv file and transform it into list of variables. Print the warning message if the transformation is not successful
+	Read the csv file and transform it into list of variables. Print the warning message if the transformation is not successful.
+	If the binary result store is read, the values are read-only memory maps of the npz file (see variable_binary_read)
  
 	:param file: csv file
 	:type file: string
 	
 	"""
-	tmp1=csv_input(file)
+	# the binary result store is used if it's given, or if it's next to the csv file and was exported together with exactly this csv file
+	binary_file=os.path.splitext(file)[0]+".npz"
+	if file.endswith(".npz"):
+		return variable_binary_read(file)
+	elif os.path.exists(binary_file) and (not os.path.exists(file) or binary_source_match(binary_file,file)):
+		return variable_binary_read(binary_file)
+	
+	name_list,unit_list,block=csv_block_input(file)
+	value,bad_data=string_array_float_transform(block)
+	value=np.ascontiguousarray(value.T)
 	output=[]
-	bad_data_checker=0
-	for i in range(len(tmp1[0])):
-		name=tmp1[0][i]
-		unit=tmp1[1][i]
-		value=[]
-		for j in range(len(tmp1)-2):
-			tmp2,tmp3=string_float_transform(tmp1[j+2][i])
-			value.append(tmp2)
-			if tmp3 != 0:
-				bad_data_checker=1        
-		output.append(variable(name,unit,value))
-	if bad_data_checker !=0:
-		print("Bad data detected(not float)")
+	for i in range(len(name_list)):
+		output.append(variable(name_list[i],unit_list[i],value[i]))
+	bad_data_report(name_list,bad_data)
 	return output
 	
+class parameter_set:
+	"""
+	A class for the parsed setting file. The parameter blocks (title row, name row, unit row and value row, separated by empty rows) are indexed by the parameter name
+	"""
+	
+	def __init__(self,file):
+		"""
+		:param file: csv file
+		:type file: string
+		"""
+		
+		# group the consecutive non-empty rows into blocks
+		block_list=[]
+		block=[]
+		for row in csv_input(file)+[[]]:
+			if any(x.strip()!="" for x in row):
+				block.append(row)
+			elif len(block)!=0:
+				block_list.append(block)
+				block=[]
+		
+		self.variable_list=[]
+		self.index={}
+		for block in block_list:
+			if len(block)==4:
+				block=block[1:] # title row
+			if len(block)!=3:
+				raise ValueError("parameter block should have title, name, unit and value rows: "+str(block[0]))
+			for j in range(len(block[0])):
+				name=block[0][j].strip()
+				if name=="":
+					continue
+				unit=block[1][j].strip() if j<len(block[1]) else ""
+				value=[]
+				if j<len(block[2]) and block[2][j].strip()!="":
+					value.append(float(block[2][j]))
+				tmp1=variable(name,unit,value)
+				self.variable_list.append(tmp1)
+				self.index[name]=tmp1
+	
+	def get(self,name):
+		"""
+		Return the parameter of the given name
+		
+		:param name: parameter name
+		:type name: string
+		:return: parameter
+		:rtype: variable
+		"""
+		
+		if name not in self.index:
+			raise KeyError("parameter "+name+" is not in the setting")
+		return self.index[name]
+	
+	def value(self,name,unit=None):
+		"""
+		Return the value of the given parameter and check its unit
+		
+		:param name: parameter name
+		:type name: string
+		:param unit: expected unit. If None, the unit is not checked
+		:type unit: string
+		:return: value
+		:rtype: float
+		"""
+		
+		tmp1=self.get(name)
+		if unit is not None and tmp1.unit!=unit:
+			raise ValueError("unit of "+name+" should be "+unit+", not "+tmp1.unit)
+		if len(tmp1.value)==0:
+			raise ValueError("parameter "+name+" has no value")
+		return tmp1.value[0]
+	
 def parameter_read(file):
 	"""
 	Read the csv file that contains multiple parameters and transform it into list of variables
@@ -102,26 +344,14 @@ def parameter_read(file):
 	:rtype: list
 	"""
 	
-	tmp1=csv_input(file)
-	iteration=int((len(tmp1)+1)/5)
-	output=[]
-	for i in range(iteration):
-		for j in range(len(tmp1[5*i+1])):
-			name=tmp1[5*i+1][j]
-			unit=tmp1[5*i+2][j]
-			value=[]
-			if tmp1[5*i+3][j] != "":
-				value.append(float(tmp1[5*i+3][j]))
-			tmp2=variable(name,unit,value)
-			output.append(tmp2)
-	return output
+	return parameter_set(file).variable_list
 	
 	
 def get_variable(variable_list,variable_name):
 	"""
 	Return the variable that fits the desired variable name from a variable list
 	
-	:param variable_list: variable list
+	:param variable_list: variable list or parameter_set
 	:type variable_list: list
 	:param variable_name: desired variable
 	:type variable_name: string
@@ -129,11 +359,12 @@ def get_variable(variable_list,variable_name):
 	:rtype: variable 
 	"""
 	
-	name_list=[]
-	for i in range(len(variable_list)):
-		name_list.append(variable_list[i].name)
-	
-	return variable_list[name_list.index(variable_name)]
+	if isinstance(variable_list,parameter_set):
+		return variable_list.get(variable_name)
+	for x in variable_list:
+		if x.name==variable_name:
+			return x
+	raise ValueError(repr(variable_name)+" is not in list")
 
 	
 def variable_output(variable_list,file):
@@ -146,24 +377,164 @@ def variable_output(variable_list,file):
 	:type file: string
     
 	"""
-	name_list=[]
-	unit_list=[]
-	value_list=[]
+	variable_stream_output(variable_list,file)
+	
+def variable_stream_output(variable_list,file,chunk_size=100000,append=False):
+	"""
+	Export the variables to csv file chunk by chunk. The rows are written directly from the values of the variables without building the whole table in memory
+    
+	:param variable_list: variables to be exported
+	:type variable_list: list
+	:param file: csv file
+	:type file: string
+	:param chunk_size: number of rows written at a time
+	:type chunk_size: int
+	:param append: if True, the rows are appended to the file without the header rows
+	:type append: bool
+    
+	"""
+	
+	# float and integer columns are formatted by float.__repr__ and int.__repr__, which give the same text as csv.writer
+	formatter_list=[]
+	for x in variable_list:
+		if isinstance(x.value,np.ndarray) and x.value.dtype.kind=="f":
+			formatter_list.append(float.__repr__)
+		elif isinstance(x.value,np.ndarray) and x.value.dtype.kind in "iu":
+			formatter_list.append(int.__repr__)
+		elif not isinstance(x.value,np.ndarray) and all(isinstance(y,float) for y in x.value):
+			formatter_list.append(float.__repr__)
+		else:
+			formatter_list.append(None)
+	numeric=None not in formatter_list
+	
+	row_number=len(variable_list[0].value)
+	for x in variable_list:
+		if len(x.value)!=row_number:
+			raise IndexError("variable "+x.name+" has "+str(len(x.value))+" values, "+str(row_number)+" expected")
+	
+	tmp=open(file,'a' if append else 'w',newline='')
+	write=csv.writer(tmp)
+	if not append:
+		write.writerow([x.name for x in variable_list])
+		write.writerow([x.unit for x in variable_list])
+	for start in range(0,row_number,chunk_size):
+		column_list=[]
+		for x in variable_list:
+			tmp1=x.value[start:start+chunk_size]
+			if isinstance(tmp1,np.ndarray):
+				tmp1=tmp1.tolist()
+			column_list.append(tmp1)
+		if numeric:
+			text_list=[list(map(formatter_list[k],column_list[k])) for k in range(len(column_list))]
+			tmp.write("".join([",".join(row)+"\r\n" for row in zip(*text_list)]))
+		else:
+			write.writerows(zip(*column_list))
+	tmp.close()
+	
+def binary_source_stamp(file):
+	"""
+	Stamp (size and modification time in ns) of the csv file that a binary result store belongs to
+	
+	:param file: csv file
+	:type file: string
+	:return: size and modification time
+	:rtype: narray
+	"""
+	
+	tmp1=os.stat(file)
+	return np.array([tmp1.st_size,tmp1.st_mtime_ns],dtype=np.int64)
+
+def binary_source_match(binary_file,file):
+	"""
+	Check if the binary result store was exported together with the csv file, i.e. its recorded stamp equals the current stamp of the csv file exactly. A store without stamp never matches
+	
+	:param binary_file: npz file
+	:type binary_file: string
+	:param file: csv file
+	:type file: string
+	:return: True if the store can be used instead of the csv file
+	:rtype: bool
+	"""
+	
+	try:
+		with np.load(binary_file) as tmp1:
+			if "source" not in tmp1.files:
+				return False
+			return bool(np.array_equal(tmp1["source"],binary_source_stamp(file)))
+	except (OSError,ValueError,zipfile.BadZipFile):
+		return False
+
+def variable_binary_output(variable_list,file,source=None):
+	"""
+	Export the variables to the binary result store (uncompressed npz file), which keeps the name, unit and value array of each variable together.
+	The store is written to a temporary file in the same folder and then moved onto the target, so the memory maps of the previous store stay valid on POSIX systems. On Windows, the replacement fails while the previous store is still mapped
+    
+	:param variable_list: variables to be exported
+	:type variable_list: list
+	:param file: npz file
+	:type file: string
+	:param source: csv file with the same variables, written before. Its stamp is recorded, so variable_read uses the store instead of the csv file only as long as the csv file is unchanged
+	:type source: string
+    
+	"""
+	
+	tmp1={}
+	if source is not None:
+		tmp1["source"]=binary_source_stamp(source)
+	tmp1["name"]=np.array([x.name for x in variable_list])
+	tmp1["unit"]=np.array([x.unit for x in variable_list])
 	for i in range(len(variable_list)):
-		name_list.append(variable_list[i].name)
-		unit_list.append(variable_list[i].unit)
-		value_list.append(variable_list[i].value)
+		tmp1["value_"+str(i)]=np.asarray(variable_list[i].value)
+	temporary_file=file+"."+str(os.getpid())+".tmp"
+	try:
+		with open(temporary_file,'wb') as tmp:
+			np.savez(tmp,**tmp1)
+		os.replace(temporary_file,file)
+	except BaseException:
+		if os.path.exists(temporary_file):
+			os.remove(temporary_file)
+		raise
+	
+def variable_binary_read(file):
+	"""
+	Read the binary result store exported by variable_binary_output. The value arrays are read-only memory maps of the file, so nothing is parsed. Copy them (e.g. np.array(x.value)) before modifying
     
+	:param file: npz file
+	:type file: string
+	:return: list of variables
+	:rtype: list
+    
+	"""
+	
+	archive=zipfile.ZipFile(file)
+	tmp=open(file,'rb')
+	tmp1=np.load(tmp)
+	name=tmp1["name"].tolist()
+	unit=tmp1["unit"].tolist()
 	output=[]
-	output.append(name_list)
-	output.append(unit_list)
-	for i in range(len(value_list[0])):
-		tmp1=[]
-		for j in range(len(value_list)):
-			tmp1.append(value_list[j][i])
-		output.append(tmp1)
-
-	csv_output(output,file)	
+	for i in range(len(name)):
+		info=archive.getinfo("value_"+str(i)+".npy")
+		if info.compress_type==zipfile.ZIP_STORED:
+			# skip the local file header of the zip member and the npy header to reach the raw data
+			tmp.seek(info.header_offset+26)
+			name_length,extra_length=struct.unpack("<HH",tmp.read(4))
+			tmp.seek(info.header_offset+30+name_length+extra_length)
+			version=np.lib.format.read_magic(tmp)
+			if version==(1,0):
+				shape,fortran_order,dtype=np.lib.format.read_array_header_1_0(tmp)
+			else:
+				shape,fortran_order,dtype=np.lib.format.read_array_header_2_0(tmp)
+			if np.prod(shape)==0 or dtype.hasobject:
+				value=tmp1["value_"+str(i)]
+			else:
+				value=np.memmap(file,dtype=dtype,mode='r',shape=shape,offset=tmp.tell(),order='F' if fortran_order else 'C')
+		else:
+			value=tmp1["value_"+str(i)]
+		output.append(variable(name[i],unit[i],value))
+	tmp1.close()
+	tmp.close()
+	archive.close()
+	return output
 	
 class variable_time:
 	"""
@@ -173,15 +544,45 @@ class variable_time:
 	def __init__(self,name,unit,value,date):
 		self.name=name
 		self.unit=unit
+		
+		# the whole series is kept as a sorted datetime64 index, and the time interval is a view of it
+		date=np.asarray(date,dtype="datetime64[us]")
+		value=np.asarray(value,dtype=float)
+		if np.any(date[1:]<date[:-1]):
+			order=np.argsort(date,kind="stable")
+			date=date[order]
+			value=value[order]
+		self.series_date=date
+		self.series_value=value
 		self.value=value
 		self.date=date
-		self.init_time=date[0]
-		self.end_time=date[-1]	
+		self.init_time=date[0].item()
+		self.end_time=date[-1].item()
+		self.window=(0,len(date))
+		self.decimate_cache={} # decimated series of each window, point number and method
+		
+	def time_index(self,time,hour):
+		"""
+		Find the index of the first data in the given hour of the given date by binary search. 0 is returned if there's no data in that hour
+		
+		:param time: date
+		:type time: datetime
+		:param hour: hour of the date
+		:type hour: int
+		:return: index in the whole series
+		:rtype: int
+		"""
+		
+		start=np.datetime64(time+timedelta(hours=hour),"us")
+		index=int(np.searchsorted(self.series_date,start,side="left"))
+		if index==len(self.series_date) or self.series_date[index]>=start+np.timedelta64(1,"h"):
+			index=0
+		return index
 		
 	def set_time(self,time1,start_hour,time2,end_hour):
         
 		"""
-		Set the time interval for the variable_time.
+		Set the time interval for the variable_time. The interval is taken from the whole series, so the data outside the previous interval is still available
     	
 		:param time1: start date in the format of %Y/%m/%d
 		:type time1: string
@@ -197,28 +598,48 @@ class variable_time:
 		init_time=datetime.strptime(time1,"%Y/%m/%d")
 		end_time=datetime.strptime(time2,"%Y/%m/%d")
     
-		index1=0
-		index2=0
-		for x in range(len(self.date)):
-			tmp1=self.date[x]
-			if tmp1.year==init_time.year and tmp1.month==init_time.month and tmp1.day==init_time.day and tmp1.hour==start_hour:
-				index1=x
-				break
-		for x in range(len(self.date)):
-			tmp1=self.date[x]
-			if tmp1.year==end_time.year and tmp1.month==end_time.month and tmp1.day==end_time.day and tmp1.hour==end_hour:
-				index2=x
-				break    
-    
-		tmp_date=self.date
-		tmp_value=self.value
-		self.date=[]
-		self.value=[]
-		for x in range(index1,index2+1):
-			self.date.append(tmp_date[x])
-			self.value.append(tmp_value[x])
+		index1=self.time_index(init_time,start_hour)
+		index2=self.time_index(end_time,end_hour)
+		self.date=self.series_date[index1:index2+1]
+		self.value=self.series_value[index1:index2+1]
+		self.window=(index1,index2+1)
 		self.init_time=init_time
 		self.end_time=end_time
+		
+	def reset_time(self):
+		"""
+		Reset the time interval to the whole series
+		"""
+		
+		self.date=self.series_date
+		self.value=self.series_value
+		self.window=(0,len(self.series_date))
+		self.init_time=self.series_date[0].item()
+		self.end_time=self.series_date[-1].item()
+	
+	def decimate(self,point_number,method="minmax"):
+		"""
+		Reduce the data in the time interval to about point_number points for plotting. The result is cached for each time interval, so plotting the same interval again doesn't scan the data
+		
+		:param point_number: number of points after decimation, e.g. the pixel width of the plot
+		:type point_number: int
+		:param method: "minmax" keeps the minimum and maximum in each bucket, "lttb" keeps the point forming the largest triangle with its neighbouring buckets
+		:type method: string
+		:return: date and value after decimation
+		:rtype: array
+		"""
+		
+		key=(self.window[0],self.window[1],point_number,method)
+		if key not in self.decimate_cache:
+			time=self.date.astype(np.int64)
+			if method=="minmax":
+				index=minmax_decimate(time,self.value,point_number)
+			elif method=="lttb":
+				index=lttb_decimate(time,self.value,point_number)
+			else:
+				raise ValueError("unknown decimation method: "+method)
+			self.decimate_cache[key]=(self.date[index],self.value[index])
+		return self.decimate_cache[key]
 	
 	def summary(self):
 		"""
@@ -232,6 +653,257 @@ class variable_time:
 		rstd=std/mean*100
 		return mean,std,rstd
 	
+	def rolling_summary(self,window):
+		"""
+		Export the moving-window mean, standard deviation and relative standard deviation of the variable_time in one pass
+    	
+		:param window: length of the moving window (hour)
+		:type window: float
+		:return: mean, std and rstd
+		:rtype: variable_time
+		"""
+		
+		tmp1=rolling_statistics(window)
+		mean=np.zeros(len(self.value))
+		std=np.zeros(len(self.value))
+		rstd=np.zeros(len(self.value))
+		time=self.date.astype(np.int64).tolist()
+		value=self.value.tolist()
+		for x in range(len(value)):
+			mean[x],std[x],rstd[x]=tmp1.update(time[x],value[x])
+		output=[]
+		output.append(variable_time(self.name+" mean",self.unit,mean,self.date))
+		output.append(variable_time(self.name+" std",self.unit,std,self.date))
+		output.append(variable_time(self.name+" rstd","%",rstd,self.date))
+		return output
+	
+	def resample_summary(self,period):
+		"""
+		Export the mean, standard deviation and relative standard deviation of each interval (e.g. period=1 for hourly, 8 for shift and 24 for daily statistics) in one pass
+    	
+		:param period: length of each interval (hour)
+		:type period: float
+		:return: mean, std and rstd at the start time of each interval
+		:rtype: variable_time
+		"""
+		
+		tmp1=resample_statistics(period)
+		time=self.date.astype(np.int64).tolist()
+		value=self.value.tolist()
+		for x in range(len(value)):
+			tmp1.update(time[x],value[x])
+		start,mean,std,rstd=tmp1.result()
+		output=[]
+		output.append(variable_time(self.name+" mean",self.unit,mean,start))
+		output.append(variable_time(self.name+" std",self.unit,std,start))
+		output.append(variable_time(self.name+" rstd","%",rstd,start))
+		return output
+	
+def minmax_decimate(x,y,point_number):
+	"""
+	Split the data into about point_number/2 buckets of nearly equal length and keep the minimum and maximum of each bucket together with the first and last points, so the peaks are preserved
+	
+	:param x: x data (sorted)
+	:type x: array
+	:param y: y data
+	:type y: array
+	:param point_number: number of points after decimation
+	:type point_number: int
+	:return: index of the points kept
+	:rtype: array
+	"""
+	
+	y=np.asarray(y,dtype=float)
+	n=len(y)
+	if point_number>=n:
+		return np.arange(n)
+	bucket_number=max((point_number-2)//2,1)
+	# the bucket lengths differ by at most one, so every bucket holds real data
+	edge=np.linspace(0,n,bucket_number+1).astype(np.int64)
+	index=edge[:-1,None]+np.arange(int(np.max(np.diff(edge))))[None,:]
+	valid=index<edge[1:,None]
+	index=np.minimum(index,n-1)
+	tmp1=np.where(valid & ~np.isnan(y[index]),y[index],np.inf)
+	tmp2=np.where(valid & ~np.isnan(y[index]),y[index],-np.inf)
+	row=np.arange(bucket_number)
+	output=np.concatenate(([0,n-1],index[row,np.argmin(tmp1,axis=1)],index[row,np.argmax(tmp2,axis=1)]))
+	return np.unique(output)
+
+def lttb_decimate(x,y,point_number):
+	"""
+	Largest-Triangle-Three-Buckets decimation. The first and last points are kept, and one point is kept in each bucket in between, which forms the largest triangle with the previous kept point and the average of the next bucket, so the shape of the trend is preserved
+	
+	:param x: x data (sorted)
+	:type x: array
+	:param y: y data
+	:type y: array
+	:param point_number: number of points after decimation
+	:type point_number: int
+	:return: index of the points kept
+	:rtype: array
+	"""
+	
+	y=np.asarray(y,dtype=float)
+	n=len(y)
+	if point_number<3 or point_number>=n:
+		return np.arange(n)
+	x=(np.asarray(x)-x[0]).astype(float)
+	edge=np.linspace(1,n-1,point_number-1).astype(np.int64)
+	index=np.zeros(point_number,dtype=np.int64)
+	index[-1]=n-1
+	a=0
+	for k in range(point_number-2):
+		start=edge[k]
+		end=edge[k+1]
+		if k<point_number-3:
+			x_average=np.mean(x[end:edge[k+2]])
+			y_average=np.mean(y[end:edge[k+2]])
+		else:
+			x_average=x[n-1]
+			y_average=y[n-1]
+		area=np.abs((x[a]-x_average)*(y[start:end]-y[a])-(x[a]-x[start:end])*(y_average-y[a]))
+		a=start+int(np.argmax(np.where(np.isnan(area),-1.0,area)))
+		index[k+1]=a
+	return index
+
+class rolling_statistics:
+	"""
+	Incremental mean, standard deviation and relative standard deviation over a moving time window. Each update costs O(1) on average, so the statistics can be refreshed whenever a new data arrives
+	"""
+	
+	def __init__(self,window):
+		"""
+		:param window: length of the moving window (hour)
+		:type window: float
+		"""
+		
+		self.window=int(round(window*3600e6)) # microsecond
+		if not self.window>0:
+			raise ValueError("window should be positive, not "+str(window)+" hour")
+		self.queue=collections.deque()
+		self.count=0
+		self.mean=0.0
+		self.square=0.0 # sum of squared deviation from the mean
+		
+	def update(self,time,value):
+		"""
+		Add one data and drop the data older than the window
+		
+		:param time: time of the data, datetime or microsecond since epoch
+		:type time: datetime
+		:param value: value of the data
+		:type value: float
+		:return: mean, std and rstd of the window
+		"""
+		
+		if not isinstance(time,int):
+			time=int(np.datetime64(time,"us").astype(np.int64))
+		self.queue.append((time,value))
+		self.count=self.count+1
+		tmp1=value-self.mean
+		self.mean=self.mean+tmp1/self.count
+		self.square=self.square+tmp1*(value-self.mean)
+		while time-self.queue[0][0]>=self.window:
+			tmp2=self.queue.popleft()[1]
+			self.count=self.count-1
+			tmp1=tmp2-self.mean
+			self.mean=self.mean-tmp1/self.count
+			self.square=max(self.square-tmp1*(tmp2-self.mean),0.0)
+		return self.result()
+	
+	def result(self):
+		"""
+		Export the mean, standard deviation and relative standard deviation of the current window
+		
+		:return: mean, std and rstd
+		"""
+		
+		if self.count==0:
+			return np.nan,np.nan,np.nan
+		std=(self.square/self.count)**0.5
+		rstd=std/self.mean*100 if self.mean!=0 else np.nan
+		return self.mean,std,rstd
+
+class resample_statistics:
+	"""
+	Incremental mean, standard deviation and relative standard deviation of consecutive time intervals (e.g. hourly, shift or daily). The intervals are aligned to midnight
+	"""
+	
+	def __init__(self,period):
+		"""
+		:param period: length of each interval (hour)
+		:type period: float
+		"""
+		
+		self.period=int(round(period*3600e6)) # microsecond
+		if not self.period>0:
+			raise ValueError("period should be positive, not "+str(period)+" hour")
+		self.start=None
+		self.count=0
+		self.mean=0.0
+		self.square=0.0
+		self.start_list=[]
+		self.mean_list=[]
+		self.std_list=[]
+		self.rstd_list=[]
+		
+	def update(self,time,value):
+		"""
+		Add one data. The data should be added in time order
+		
+		:param time: time of the data, datetime or microsecond since epoch
+		:type time: datetime
+		:param value: value of the data
+		:type value: float
+		"""
+		
+		if not isinstance(time,int):
+			time=int(np.datetime64(time,"us").astype(np.int64))
+		start=time-time%self.period
+		if start!=self.start:
+			if self.count!=0:
+				self.close()
+			self.start=start
+		self.count=self.count+1
+		tmp1=value-self.mean
+		self.mean=self.mean+tmp1/self.count
+		self.square=self.square+tmp1*(value-self.mean)
+		
+	def close(self):
+		"""
+		Store the statistics of the current interval and start a new one
+		"""
+		
+		std=(self.square/self.count)**0.5
+		self.start_list.append(self.start)
+		self.mean_list.append(self.mean)
+		self.std_list.append(std)
+		self.rstd_list.append(std/self.mean*100 if self.mean!=0 else np.nan)
+		self.count=0
+		self.mean=0.0
+		self.square=0.0
+		
+	def result(self):
+		"""
+		Export the statistics of every interval, including the current one
+		
+		:return: start time of the intervals (datetime64), mean, std and rstd
+		:rtype: narray
+		"""
+		
+		start_list=list(self.start_list)
+		mean_list=list(self.mean_list)
+		std_list=list(self.std_list)
+		rstd_list=list(self.rstd_list)
+		if self.count!=0:
+			std=(self.square/self.count)**0.5
+			start_list.append(self.start)
+			mean_list.append(self.mean)
+			std_list.append(std)
+			rstd_list.append(std/self.mean*100 if self.mean!=0 else np.nan)
+		start=np.array(start_list,dtype=np.int64).astype("datetime64[us]")
+		return start,np.array(mean_list),np.array(std_list),np.array(rstd_list)
+	
 def variable_time_read(file,date_form):
 	"""
 	Read the csv file and transform it into variable_time. Print the warning message if the transformation is not successful
@@ -242,24 +914,14 @@ def variable_time_read(file,date_form):
 	:type form: string
 	"""
 
-	tmp1=csv_input(file)
-	date=[]
-	for i in range(len(tmp1)-2):
-		date.append(datetime.strptime(tmp1[i+2][0],date_form))
+	name_list,unit_list,block=csv_block_input(file)
+	date=string_array_datetime_transform(block[:,0],date_form)
+	value,bad_data=string_array_float_transform(block[:,1:])
+	value=np.ascontiguousarray(value.T)
 	output=[]
-	bad_data_checker=0
-	for i in range(len(tmp1[0])-1):
-		name=tmp1[0][i+1]
-		unit=tmp1[1][i+1]
-		value=[]
-		for j in range(len(tmp1)-2):
-			tmp2,tmp3=string_float_transform(tmp1[j+2][i+1])
-			value.append(tmp2)
-			if tmp3 != 0:
-				bad_data_checker=1
-		output.append(variable_time(name,unit,value,date))
-	if bad_data_checker==1:
-		print("Bad data detected(not float)")
+	for i in range(len(name_list)-1):
+		output.append(variable_time(name_list[i+1],unit_list[i+1],value[i],date))
+	bad_data_report(name_list[1:],bad_data)
 	return output	
 	
 	
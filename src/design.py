@@ -0,0 +1,88 @@
+from sweep import *
+from scipy.optimize import differential_evolution
+
+def design(base,bound,target_size=None,target_CV=None,target_CSD=None,type="volume",population=30,max_iteration=300,seed=None):
+    """
+    Find the operating condition (e.g. R, z, Lf, Lp and tau) that gives the target product CSD by differential evolution.
+    Each generation is evaluated at once by crystal_sweep and the closed-form PDF, so tens of thousands of evaluations are affordable.
+    The objective is the sum of the squared relative errors of the given targets
+    
+    :param base: crystal that provides the parameters not designed (kinetics, slurry concentration, etc.)
+    :type base: crystal
+    :param bound: [lower, upper] bound of each designed parameter, keyed by the attribute name in setting_list
+    :type bound: dict
+    :param target_size: target median size (um)
+    :type target_size: float
+    :param target_CV: target CV (%)
+    :type target_CV: float
+    :param target_CSD: target CSD file (size and fraction) in the format of variable_read
+    :type target_CSD: string
+    :param type: "number" or "volume" basis of the targets
+    :type type: string
+    :param population: population size multiplier of differential evolution
+    :type population: int
+    :param max_iteration: maximum number of generations
+    :type max_iteration: int
+    :param seed: random seed
+    :type seed: int
+    :return: designed parameters and the result of differential_evolution
+    :rtype: dict
+    """
+    
+    if target_size is None and target_CV is None and target_CSD is None:
+        raise ValueError("at least one target should be given")
+    order=0 if type=="number" else 3
+    name_list=list(bound.keys())
+    
+    if target_CSD is not None:
+        tmp1=variable_read(target_CSD)
+        size=np.asarray(tmp1[0].value,dtype=float)
+        fraction=np.asarray(tmp1[1].value,dtype=float)
+        tmp2=(size[1:]+size[:-1])/2
+        lower=np.concatenate([[max(2*size[0]-tmp2[0],0)],tmp2])
+        upper=np.concatenate([tmp2,[2*size[-1]-tmp2[-1]]])
+    
+    evaluation=[0]
+    def objective(x):
+        # x has one column per candidate, the parameters are kept as column arrays to broadcast with the CSD bins
+        parameters={}
+        for k in range(len(name_list)):
+            parameters[name_list[k]]=x[k][:,None]
+        tmp3=crystal_sweep(parameters,base)
+        tmp3.solve()
+        evaluation[0]=evaluation[0]+tmp3.case_number
+        output=np.zeros(tmp3.case_number)
+        with np.errstate(over="ignore",invalid="ignore",divide="ignore"):
+            if target_size is not None:
+                output=output+((tmp3.size_quantile(0.5,type)[:,0]-target_size)/target_size)**2
+            if target_CV is not None:
+                output=output+((tmp3.size_statistics(type)[1][:,0]-target_CV)/target_CV)**2
+            if target_CSD is not None:
+                tmp4=tmp3.moment(order,lower,upper)
+                tmp4=tmp4/np.sum(tmp4,axis=1,keepdims=True)
+                output=output+np.sum((tmp4-fraction)**2,axis=1)/np.sum(fraction**2)
+        # the fines cut size should be smaller than the product cut size
+        if "Lf" in name_list or "Lp" in name_list:
+            output=np.where(np.ravel(tmp3.Lf>=tmp3.Lp),1e10,output)
+        return np.where(np.isfinite(output),output,1e10)
+    
+    result=differential_evolution(objective,[bound[x] for x in name_list],popsize=population,maxiter=max_iteration,seed=seed,vectorized=True,updating="deferred",polish=False,tol=1e-10)
+    
+    output={}
+    for k in range(len(name_list)):
+        output[name_list[k]]=result.x[k]
+    
+    tmp5=crystal()
+    for x in setting_list:
+        setattr(tmp5,x[0],output.get(x[0],getattr(base,x[0])))
+    tmp5.solve("newton")
+    mean,CV=tmp5.size_statistics(type)
+    tmp6=[]
+    for x in name_list:
+        tmp6.append(x+": "+str(output[x]))
+    tmp6.append("Median Size ("+type+"): "+str(float(tmp5.size_quantile(0.5,type)[0]))+" um")
+    tmp6.append("CV ("+type+"): "+str(float(CV[0]))+" %")
+    tmp6.append("Objective: "+str(result.fun))
+    tmp6.append("Evaluations: "+str(evaluation[0]))
+    print_list(tmp6)
+    return output,result
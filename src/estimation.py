@@ -0,0 +1,149 @@
+from crystal import *
+from concurrent.futures import ProcessPoolExecutor
+from scipy.optimize import least_squares
+
+class experiment:
+    """
+    Module used to represent one experiment, which contains the setting and the measured CSD
+    """
+    
+    def __init__(self,setting_file,CSD_file,type):
+        """
+        :param setting_file: setting file of the experiment
+        :type setting_file: string
+        :param CSD_file: measured CSD (size and fraction), in the format of variable_read
+        :type CSD_file: string
+        :param type: "number" or "volume"
+        :type type: string
+        """
+        
+        self.crystal=crystal()
+        self.crystal.read_setting(setting_file)
+        tmp1=variable_read(CSD_file)
+        self.size=np.asarray(tmp1[0].value,dtype=float)
+        self.fraction=np.asarray(tmp1[1].value,dtype=float)
+        if type=="number":
+            self.order=0
+        elif type=="volume":
+            self.order=3
+        else:
+            raise ValueError("type should be number or volume")
+        
+        # the bin edges are the midpoints between the measured sizes
+        tmp2=(self.size[1:]+self.size[:-1])/2
+        self.lower=np.concatenate([[max(self.size[0]-(tmp2[0]-self.size[0]),0)],tmp2])
+        self.upper=np.concatenate([tmp2,[self.size[-1]+(self.size[-1]-tmp2[-1])]])
+        self.guess=10
+    
+    def model_fraction(self,parameter):
+        """
+        Model CSD on the measured size bins from the closed-form moments, normalized over the measured bins
+        
+        :param parameter: Kr, j and i
+        :type parameter: list
+        :return: number or volume fraction
+        :rtype: narray
+        """
+        
+        self.crystal.Kr,self.crystal.j,self.crystal.i=parameter
+        self.crystal.solve("newton",self.guess)
+        if not self.crystal.converged:
+            return np.full(len(self.size),np.nan)
+        # the converged growth rate is the initial guess of the next evaluation
+        self.guess=float(self.crystal.G[0])
+        tmp1=self.crystal.moment(self.order,self.lower,self.upper)
+        return tmp1/np.sum(tmp1)
+    
+    def residual(self,parameter):
+        """
+        Difference between the model and measured CSD. The failed solve gets residual of 1 in every bin
+        
+        :param parameter: Kr, j and i
+        :type parameter: list
+        :return: residual
+        :rtype: narray
+        """
+        
+        output=self.model_fraction(parameter)-self.fraction
+        return np.nan_to_num(output,nan=1.0)
+
+# experiments loaded in the current process, each worker process keeps its own copy
+experiment_list=[]
+
+def load_experiment(case_list):
+    """
+    Load the experiments into the current process
+    
+    :param case_list: list of [setting file, CSD file, type] of each experiment
+    :type case_list: list
+    """
+    
+    experiment_list.clear()
+    for x in case_list:
+        experiment_list.append(experiment(*x))
+
+def experiment_residual(parameter,index):
+    """
+    Residual of one loaded experiment, used by the worker processes
+    
+    :param parameter: Kr, j and i
+    :type parameter: list
+    :param index: index of the experiment
+    :type index: int
+    :return: residual
+    :rtype: narray
+    """
+    
+    return experiment_list[index].residual(parameter)
+
+def kinetic_fit(case_list,initial=None,worker_number=1):
+    """
+    Fit the nucleation kinetics (Kr, j and i) to the measured CSDs of all experiments at once by least squares. Kr is fitted in log scale
+    
+    :param case_list: list of [setting file, CSD file, type] of each experiment
+    :type case_list: list
+    :param initial: initial Kr, j and i. If None, the values in the setting of the first experiment are used
+    :type initial: list
+    :param worker_number: number of worker processes that evaluate the experiments in parallel
+    :type worker_number: int
+    :return: fitted Kr, j, i and the result of least_squares
+    :rtype: list
+    """
+    
+    load_experiment(case_list)
+    if initial is None:
+        tmp1=experiment_list[0].crystal
+        initial=[tmp1.Kr,tmp1.j,tmp1.i]
+    x0=np.array([np.log10(initial[0]),initial[1],initial[2]])
+    
+    executor=None
+    if worker_number>1:
+        executor=ProcessPoolExecutor(max_workers=worker_number,initializer=load_experiment,initargs=(case_list,))
+    
+    def residual(x):
+        parameter=[10**x[0],x[1],x[2]]
+        index_list=range(len(case_list))
+        if executor is None:
+            output=[experiment_residual(parameter,k) for k in index_list]
+        else:
+            chunk_size=max(1,len(case_list)//(4*worker_number))
+            output=list(executor.map(experiment_residual,[parameter]*len(case_list),index_list,chunksize=chunk_size))
+        return np.concatenate(output)
+    
+    try:
+        result=least_squares(residual,x0,method="trf",x_scale=[1,0.1,0.1])
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    Kr=10**result.x[0]
+    j=result.x[1]
+    i=result.x[2]
+    tmp2=[]
+    tmp2.append("Kr: "+str(Kr))
+    tmp2.append("j: "+str(j))
+    tmp2.append("i: "+str(i))
+    tmp2.append("Residual (sum of squares): "+str(2*result.cost))
+    tmp2.append("Model evaluations: "+str(result.nfev))
+    print_list(tmp2)
+    return [Kr,j,i],result
@@ -1,6 +1,10 @@
 from data import *
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates # setting the x axis formatter
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg # headless rendering without pyplot
+from concurrent.futures import ProcessPoolExecutor
+import os
 
 def plot_variable(x,y,xlabel,ylabel,title,xlim,ylim,form):
     """
@@ -117,7 +121,7 @@ def plot_validation(x,y,data_range,xlabel,ylabel,title):
     if title!="off":
         plt.title(title,fontsize=18)
         
-def plot_variable_time(variable_time,ylabel,title,ylim,form,interval):
+def plot_variable_time(variable_time,ylabel,title,ylim,form,interval,point_number=0,method="minmax"):
     """
     Plot the x-t figure and set the format automatically
     
@@ -133,9 +137,16 @@ def plot_variable_time(variable_time,ylabel,title,ylim,form,interval):
     :type form: char
     :param interval: the time step of the variable_time (in unit of hour)
     :type interval: float
+    :param point_number: number of points plotted after decimation (about 2000 for the 8 inch figure at 300 dpi). If point_number=0, all the data is plotted
+    :type point_number: int
+    :param method: decimation method, "minmax" or "lttb"
+    :type method: string
     """
-    date=variable_time.date
-    y=variable_time.value
+    if point_number>0:
+        date,y=variable_time.decimate(point_number,method)
+    else:
+        date=variable_time.date
+        y=variable_time.value
     #plt.rcParams['font.sans-serif']=['Noto Sans CJK TC']
     #plt.rcParams['axes.unicode_minus'] = False 
     plt.figure(figsize=([8,8]),dpi=300)
@@ -161,7 +172,7 @@ def plot_variable_time(variable_time,ylabel,title,ylim,form,interval):
     if title!="off":
         plt.title(title,fontsize=18)
         
-def plot_variable_time_legend(variable_time_list,legend,ylabel,title,ylim,form,interval):
+def plot_variable_time_legend(variable_time_list,legend,ylabel,title,ylim,form,interval,point_number=0,method="minmax"):
     """
     Plot the x-t figure with multiple legends and set the format automatically
     
@@ -179,13 +190,20 @@ def plot_variable_time_legend(variable_time_list,legend,ylabel,title,ylim,form,i
     :type form: char
     :param interval: the time step of the variable_time (in unit of hour)
     :type interval: float
+    :param point_number: number of points plotted for each line after decimation (about 2000 for the 8 inch figure at 300 dpi). If point_number=0, all the data is plotted
+    :type point_number: int
+    :param method: decimation method, "minmax" or "lttb"
+    :type method: string
     """
     #plt.rcParams['font.sans-serif']=['Noto Sans CJK TC']
     #plt.rcParams['axes.unicode_minus'] = False 
     plt.figure(figsize=([8,8]),dpi=300)
     for i in range(len(variable_time_list)):
-        date=variable_time_list[i].date
-        y=variable_time_list[i].value
+        if point_number>0:
+            date,y=variable_time_list[i].decimate(point_number,method)
+        else:
+            date=variable_time_list[i].date
+            y=variable_time_list[i].value
         plt.plot(date,y,form,markersize=2,label=legend[i])
     if ylim[0]!=0 or ylim[1]!=0:
         plt.ylim(ylim[0],ylim[1])
@@ -209,7 +227,7 @@ def plot_variable_time_legend(variable_time_list,legend,ylabel,title,ylim,form,i
     if title!="off":
         plt.title(title,fontsize=18)
         
-def twin_plot(variable_time1,variable_time2,ylim1,ylim2):
+def twin_plot(variable_time1,variable_time2,ylim1,ylim2,point_number=0,method="minmax"):
     """
     Plot two time-dependent variables on different y-axis scale and set the format automatically
     
@@ -221,8 +239,18 @@ def twin_plot(variable_time1,variable_time2,ylim1,ylim2):
     :type ylim1: list
     :param ylim2: the range of y-axis limit for the second time-dependent variable
     :type ylim2: list
+    :param point_number: number of points plotted for each variable after decimation (about 2000 for the 8 inch figure at 300 dpi). If point_number=0, all the data is plotted
+    :type point_number: int
+    :param method: decimation method, "minmax" or "lttb"
+    :type method: string
     
     """
+    if point_number>0:
+        date1,value1=variable_time1.decimate(point_number,method)
+        date2,value2=variable_time2.decimate(point_number,method)
+    else:
+        date1,value1=variable_time1.date,variable_time1.value
+        date2,value2=variable_time2.date,variable_time2.value
     # plot the result
     #plt.rcParams['font.sans-serif']=['Noto Sans CJK TC']
     #plt.rcParams['axes.unicode_minus'] = False 
@@ -231,7 +259,7 @@ def twin_plot(variable_time1,variable_time2,ylim1,ylim2):
     [fig, ax1]=plt.subplots(figsize=[8,6.5],dpi=300)
     color1='tab:red'
     ax1.set_ylabel(variable_time1.unit,color=color1,fontsize=16)
-    p1,=ax1.plot(variable_time1.date,variable_time1.value,'o',color=color1,markersize=2,label=variable_time1.name)
+    p1,=ax1.plot(date1,value1,'o',color=color1,markersize=2,label=variable_time1.name)
     if ylim1[0]!=0 or ylim1[1]!=0:
         ax1.set_ylim(ylim1[0],ylim1[1])
     plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
@@ -242,9 +270,142 @@ def twin_plot(variable_time1,variable_time2,ylim1,ylim2):
     ax2=ax1.twinx()
     color2='tab:blue'
     ax2.set_ylabel(variable_time2.unit,color=color2,fontsize=16)
-    p2,=ax2.plot(variable_time2.date,variable_time2.value,'o',color=color2,markersize=2,label=variable_time2.name)
+    p2,=ax2.plot(date2,value2,'o',color=color2,markersize=2,label=variable_time2.name)
     if ylim2[0]!=0 or ylim2[1]!=0:
         ax2.set_ylim(ylim2[0],ylim2[1])
     ax2.tick_params(axis='y',labelcolor=color2,labelsize=16)
     ax1.legend(handles=[p1,p2],loc=2)    
-    fig.tight_layout()    
+    fig.tight_layout()
+
+class figure_renderer:
+    """
+    Headless x-y plot renderer for batch runs. One figure and axes are created on the Agg canvas without pyplot, and only the line data is updated between cases, so the memory doesn't grow with the number of plots
+    """
+    
+    def __init__(self,xlabel,ylabel,form,figsize=[8,6],dpi=300):
+        """
+        :param xlabel: x label of the plot
+        :type xlabel: string
+        :param ylabel: y label of the plot
+        :type ylabel: string
+        :param form: dot form
+        :type form: char
+        :param figsize: figure size (inch)
+        :type figsize: list
+        :param dpi: resolution of the raster output
+        :type dpi: int
+        """
+        
+        self.figure=Figure(figsize=figsize,dpi=dpi)
+        FigureCanvasAgg(self.figure)
+        self.axes=self.figure.add_subplot()
+        self.line,=self.axes.plot([],[],form)
+        self.axes.set_xlabel(xlabel,fontsize=12)
+        self.axes.set_ylabel(ylabel,fontsize=12)
+        self.axes.tick_params(labelsize=10)
+        self.title=self.axes.set_title("",fontsize=18)
+    
+    def render(self,x,y,file,title="off",xlim=[0,0],ylim=[0,0]):
+        """
+        Update the line data and save the figure. The file format (png, svg, ...) follows the file extension
+        
+        :param x: data for x-axis
+        :type x: list
+        :param y: data for y-axis
+        :type y: list
+        :param file: output file name
+        :type file: string
+        :param title: title of the plot. If title="off", there's no title
+        :type title: string
+        :param xlim: range for x-axis. If xlim=[0,0], the default range is used
+        :type xlim: list
+        :param ylim: range for y-axis. If ylim=[0,0], the default range is used
+        :type ylim: list
+        """
+        
+        self.line.set_data(x,y)
+        self.axes.set_autoscale_on(True)
+        self.axes.relim()
+        self.axes.autoscale_view()
+        if xlim[0]!=0 or xlim[1]!=0:
+            self.axes.set_xlim(xlim[0],xlim[1])
+        if ylim[0]!=0 or ylim[1]!=0:
+            self.axes.set_ylim(ylim[0],ylim[1])
+        if title!="off":
+            self.title.set_text(title)
+        else:
+            self.title.set_text("")
+        self.figure.savefig(file)
+    
+    def close(self):
+        """
+        Release the figure
+        """
+        
+        if self.figure is not None:
+            self.figure.clear()
+            self.figure=None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self,exc_type,exc_value,traceback):
+        self.close()
+
+# renderer of the current worker process, created once by render_CSD_initialize
+CSD_renderer=[]
+
+def render_CSD_initialize():
+    """
+    Create the CSD renderer of the current process
+    """
+    
+    CSD_renderer.clear()
+    CSD_renderer.append(figure_renderer("size ($\\mu m$)","fraction (-)","o--"))
+
+def render_CSD(setting_dir,type,format):
+    """
+    Render the exported CSD of one case folder to Result/CSD(type).format
+    
+    :param setting_dir: case folder, ended with "/"
+    :type setting_dir: string
+    :param type: "number" or "volume"
+    :type type: string
+    :param format: file format, e.g. "png" or "svg"
+    :type format: string
+    :return: output file, or the error message if failed
+    :rtype: string
+    """
+    
+    if len(CSD_renderer)==0:
+        render_CSD_initialize()
+    try:
+        tmp1=variable_read(setting_dir+"Result/CSD("+type+").csv")
+        file=setting_dir+"Result/CSD("+type+")."+format
+        CSD_renderer[0].render(tmp1[0].value,tmp1[1].value,file,"Crystal Size Distribution ("+type+")")
+        return file
+    except Exception as error:
+        return "failed: "+setting_dir+" "+repr(error)
+
+def render_CSD_all(setting_dir_list,type,format="png",worker_number=None):
+    """
+    Render the exported CSD of many case folders in parallel worker processes. Each worker reuses one renderer for all its cases
+    
+    :param setting_dir_list: case folders, ended with "/"
+    :type setting_dir_list: list
+    :param type: "number" or "volume"
+    :type type: string
+    :param format: file format, e.g. "png" or "svg"
+    :type format: string
+    :param worker_number: number of worker processes. If None, the number of CPUs is used
+    :type worker_number: int
+    :return: output file (or error message) of each case
+    :rtype: list
+    """
+    
+    number=len(setting_dir_list)
+    if worker_number is None:
+        worker_number=os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=worker_number,initializer=render_CSD_initialize) as executor:
+        output=list(executor.map(render_CSD,setting_dir_list,[type]*number,[format]*number,chunksize=max(1,number//(4*worker_number))))
+    return output
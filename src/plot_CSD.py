@@ -15,7 +15,7 @@ if type=="number":
 elif type=="volume":
     file=setting_dir+"Result/CSD(volume).csv"
 
-tmp1=variable_read(file)
+tmp1=variable_read(file) # the npz result store exported together with the csv file is read instead if the csv file is unchanged
 x=tmp1[0].value
 y=tmp1[1].value
 xlabel="size ($\mu m$)"
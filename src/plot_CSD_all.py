@@ -0,0 +1,16 @@
+from batch import *
+from figure import *
+import os
+
+# ===========================================
+
+root_dir=r"../examples/"
+type="volume" # number or volume
+format="png" # png or svg
+worker_number=os.cpu_count()
+
+# ===========================================
+
+if __name__=="__main__":
+    result=render_CSD_all(find_setting(root_dir),type,format,worker_number)
+    print_list(result)
@@ -5,6 +5,7 @@ from crystal import *
 
 setting_dir=r"../examples/ammonium alum/"
 CSD_mesh_size=1 # um
+binary_output=False # also export the result to npz files for fast reloading
 
 # ===========================================
 
@@ -13,7 +14,7 @@ tmp1=crystal()
 tmp1.read_setting(file)
 
 tmp1.solve()
-tmp1.output(setting_dir,CSD_mesh_size)
+tmp1.output(setting_dir,CSD_mesh_size,binary_output)
 
 
 
@@ -0,0 +1,13 @@
+from batch import *
+import os
+
+# ===========================================
+
+root_dir=r"../examples/"
+CSD_mesh_size=1 # um
+worker_number=os.cpu_count()
+
+# ===========================================
+
+if __name__=="__main__":
+    run_all(root_dir,CSD_mesh_size,worker_number)
@@ -0,0 +1,17 @@
+from batch import *
+
+# ===========================================
+
+setting_file=r"../examples/setting_table.csv" # one case per row
+base_setting_file=None # setting.csv that provides the parameters not in the table
+result_file=r"../examples/result_table.csv"
+chunk_size=10000 # cases solved at a time
+
+# ===========================================
+
+base=None
+if base_setting_file is not None:
+    base=crystal()
+    base.read_setting(base_setting_file)
+
+solve_table(setting_file,result_file,base,chunk_size)
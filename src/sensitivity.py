@@ -0,0 +1,105 @@
+from uncertainty import *
+
+def sobol_index(f_A,f_B,f_AB):
+    """
+    First-order (Saltelli 2010) and total-order (Jansen) Sobol indices
+    
+    :param f_A: output of sample matrix A
+    :type f_A: narray
+    :param f_B: output of sample matrix B
+    :type f_B: narray
+    :param f_AB: output of matrix A with the i-th column from B, one column per parameter
+    :type f_AB: narray
+    :return: first-order and total-order indices of each parameter
+    :rtype: narray
+    """
+    
+    # the outputs are centered first, otherwise a large mean swamps the first-order estimate
+    mean=np.mean(np.concatenate([f_A,f_B]))
+    f_A=f_A-mean
+    f_B=f_B-mean
+    f_AB=f_AB-mean
+    variance=np.var(np.concatenate([f_A,f_B]))
+    first=np.mean(f_B[:,None]*(f_AB-f_A[:,None]),axis=0)/variance
+    total=0.5*np.mean((f_A[:,None]-f_AB)**2,axis=0)/variance
+    return first,total
+
+def sensitivity(base,distribution,sample_number,bootstrap_number=200,confidence=95,chunk_size=1000,worker_number=None,seed=None):
+    """
+    Global sensitivity analysis of the product median size (L50) and CV (volume based) by Sobol indices.
+    The Saltelli sample matrices (sample_number*(parameter number+2) solves) are evaluated by crystal_sweep chunk by chunk in a process pool, and the confidence intervals are estimated by bootstrap
+    
+    :param base: crystal that provides the parameters not sampled
+    :type base: crystal
+    :param distribution: distribution of each parameter (e.g. tau, MT, R, Lf, z, Lp, Kr, i and j), see parameter_sample
+    :type distribution: dict
+    :param sample_number: number of base samples (a power of 2 is preferred for Sobol sequence)
+    :type sample_number: int
+    :param bootstrap_number: number of bootstrap resamples
+    :type bootstrap_number: int
+    :param confidence: confidence level of the intervals (%)
+    :type confidence: float
+    :param chunk_size: number of samples solved in one task
+    :type chunk_size: int
+    :param worker_number: number of worker processes. If None, the number of CPUs is used
+    :type worker_number: int
+    :param seed: random seed
+    :type seed: int
+    :return: indices and confidence intervals of L50 and CV
+    :rtype: list
+    """
+    
+    name_list=list(distribution.keys())
+    d=len(name_list)
+    unit_sample=qmc.Sobol(d=2*d,scramble=True,seed=seed).random(sample_number)
+    A=unit_sample[:,:d]
+    B=unit_sample[:,d:]
+    matrix_list=[A,B]
+    for k in range(d):
+        AB=A.copy()
+        AB[:,k]=B[:,k]
+        matrix_list.append(AB)
+    sample=parameter_transform(distribution,np.concatenate(matrix_list))
+    
+    row_number=sample_number*(d+2)
+    chunk_list=[]
+    for start in range(0,row_number,chunk_size):
+        chunk_list.append({x:sample[x][start:start+chunk_size] for x in sample})
+    with ProcessPoolExecutor(max_workers=worker_number) as executor:
+        metric=np.concatenate([x[0] for x in executor.map(sample_evaluate,chunk_list,[base]*len(chunk_list))])
+    
+    rng=np.random.default_rng(seed)
+    alpha=(100-confidence)/2
+    output=[]
+    report=[]
+    for column,metric_name in [[3,"L50"],[5,"CV"]]:
+        f=metric[:,column].reshape(d+2,sample_number)
+        # the samples without physical root are dropped
+        valid=np.all(np.isfinite(f),axis=0)
+        f_A=f[0][valid]
+        f_B=f[1][valid]
+        f_AB=f[2:][:,valid].T
+        first,total=sobol_index(f_A,f_B,f_AB)
+        
+        first_bootstrap=np.zeros((bootstrap_number,d))
+        total_bootstrap=np.zeros((bootstrap_number,d))
+        index_list=np.flatnonzero(valid)
+        for x in range(bootstrap_number):
+            tmp1=rng.choice(len(index_list),len(index_list))
+            first_bootstrap[x],total_bootstrap[x]=sobol_index(f_A[tmp1],f_B[tmp1],f_AB[tmp1])
+        
+        tmp2=[]
+        tmp2.append(variable("parameter","-",name_list))
+        tmp2.append(variable(metric_name+" first order","-",first))
+        tmp2.append(variable(metric_name+" first order lower","-",np.percentile(first_bootstrap,alpha,axis=0)))
+        tmp2.append(variable(metric_name+" first order upper","-",np.percentile(first_bootstrap,100-alpha,axis=0)))
+        tmp2.append(variable(metric_name+" total order","-",total))
+        tmp2.append(variable(metric_name+" total order lower","-",np.percentile(total_bootstrap,alpha,axis=0)))
+        tmp2.append(variable(metric_name+" total order upper","-",np.percentile(total_bootstrap,100-alpha,axis=0)))
+        output.append(tmp2)
+        
+        report.append(metric_name+" ("+str(int(np.sum(valid)))+" valid samples)")
+        for k in range(d):
+            report.append("  "+name_list[k]+": S1="+str(first[k])+", ST="+str(total[k]))
+    print_list(report)
+    return output
@@ -0,0 +1,193 @@
+from crystal import *
+import itertools
+
+def parameter_grid(**kwargs):
+    """
+    Build the full factorial grid of the crystallizer parameters
+    
+    :param kwargs: list of values for each parameter, the keyword is the attribute name in setting_list (e.g. tau=[10,15,20])
+    :type kwargs: list
+    :return: flattened value array of each parameter
+    :rtype: dict
+    """
+    
+    name_list=list(kwargs.keys())
+    grid=np.meshgrid(*[np.asarray(kwargs[x],dtype=float) for x in name_list],indexing="ij")
+    output={}
+    for i in range(len(name_list)):
+        output[name_list[i]]=grid[i].ravel()
+    return output
+
+def setting_batch_read(file_list):
+    """
+    Read many setting files into one structured array (one record per file), which can be given to crystal_sweep
+    
+    :param file_list: setting files
+    :type file_list: list
+    :return: parameters of each file, one field per attribute in setting_list
+    :rtype: narray
+    """
+    
+    output=np.zeros(len(file_list),dtype=[(x[0],float) for x in setting_list])
+    for k in range(len(file_list)):
+        tmp1=parameter_set(file_list[k])
+        for attribute,name,unit in setting_list:
+            output[attribute][k]=tmp1.value(name,unit)
+    return output
+
+def setting_table_read(file,base=None):
+    """
+    Read the multi-case setting table into one structured array. The table has the parameter names in the first row, the units in the second row and one case per row after that.
+    The columns not in setting_list are ignored
+    
+    :param file: csv file of the table
+    :type file: string
+    :param base: crystal that provides the parameters not in the table. If None, every parameter should be in the table
+    :type base: crystal
+    :return: parameters of each case, one field per attribute in setting_list
+    :rtype: narray
+    """
+    
+    name_list,unit_list,block=csv_block_input(file)
+    return setting_table_transform(name_list,unit_list,block,base)
+
+def setting_table_chunk(file,chunk_size,base=None):
+    """
+    Read the multi-case setting table chunk by chunk, so a table of many cases is never kept in memory
+    
+    :param file: csv file of the table
+    :type file: string
+    :param chunk_size: number of cases of each chunk
+    :type chunk_size: int
+    :param base: crystal that provides the parameters not in the table
+    :type base: crystal
+    :return: parameters of the cases of each chunk
+    :rtype: generator
+    """
+    
+    for name_list,unit_list,block in csv_chunk_input(file,chunk_size):
+        yield setting_table_transform(name_list,unit_list,block,base)
+
+def setting_table_transform(name_list,unit_list,block,base=None):
+    """
+    Transform the rows of the multi-case setting table into a structured array and check the units
+    
+    :param name_list: parameter name of each column
+    :type name_list: list
+    :param unit_list: unit of each column
+    :type unit_list: list
+    :param block: the rows of the table
+    :type block: narray of string
+    :param base: crystal that provides the parameters not in the table
+    :type base: crystal
+    :return: parameters of each case
+    :rtype: narray
+    """
+    
+    name_list=[x.strip() for x in name_list]
+    column_list=[name_list.index(x[1]) for x in setting_list if x[1] in name_list]
+    value,bad_data=string_array_float_transform(block[:,column_list])
+    bad_data_report([name_list[k] for k in column_list],bad_data)
+    output=np.zeros(len(block),dtype=[(x[0],float) for x in setting_list])
+    for attribute,name,unit in setting_list:
+        if name in name_list:
+            k=name_list.index(name)
+            if unit_list[k].strip()!=unit:
+                raise ValueError("unit of "+name+" should be "+unit+", not "+unit_list[k])
+            output[attribute]=value[:,column_list.index(k)]
+        elif base is not None:
+            output[attribute]=getattr(base,attribute)
+        else:
+            raise KeyError("parameter "+name+" is not in the table")
+    return output
+
+class crystal_sweep(crystal):
+    """
+    Module used to solve many crystallizer configurations at once. Every parameter is stored as an array, so the material balance is solved for all the configurations in a vectorized way
+    """
+    
+    def __init__(self,parameters,base=None):
+        """
+        :param parameters: value arrays of the swept parameters, keyed by the attribute name in setting_list. A dict from parameter_grid or a structured array is accepted
+        :type parameters: dict
+        :param base: crystal that provides the parameters not given in parameters
+        :type base: crystal
+        """
+        
+        if hasattr(parameters,"dtype"):
+            name_list=parameters.dtype.names
+        else:
+            name_list=list(parameters.keys())
+        
+        value_list=[]
+        for attribute,name,unit in setting_list:
+            if attribute in name_list:
+                value_list.append(np.asarray(parameters[attribute],dtype=float))
+            elif base is not None:
+                value_list.append(np.asarray(getattr(base,attribute),dtype=float))
+            else:
+                raise KeyError("parameter "+attribute+" ("+name+") is not specified")
+        
+        value_list=np.broadcast_arrays(*value_list)
+        for i in range(len(setting_list)):
+            setattr(self,setting_list[i][0],np.array(value_list[i]))
+        self.case_number=self.tau.size
+    
+    def solve(self,tolerance=1e-13,max_iteration=200):
+        """
+        Solve the material balance of all configurations by bisection on log(G). The configurations without physical root get nan
+        
+        :param tolerance: relative tolerance of growth rate
+        :type tolerance: float
+        :param max_iteration: maximum number of bisection
+        :type max_iteration: int
+        """
+        
+        with np.errstate(over="ignore",invalid="ignore",divide="ignore"):
+            # bracket the root, material balance increases with growth rate
+            G_low=np.full(self.tau.shape,1e-3)
+            G_high=np.full(self.tau.shape,1e3)
+            # the exponential terms overflow at very small growth rate, so G_low is raised where the residual is nan
+            for x in range(20):
+                tmp1=self.material_balance(G_low)
+                tmp2=self.material_balance(G_high)
+                G_low=np.where(tmp1>0,G_low/10,np.where(np.isnan(tmp1),G_low*10,G_low))
+                G_high=np.where(tmp2<0,G_high*10,G_high)
+                if not np.any((tmp1>0) | np.isnan(tmp1) | (tmp2<0)):
+                    break
+            bracket=(self.material_balance(G_low)<=0) & (self.material_balance(G_high)>=0)
+            
+            # bisection
+            for x in range(max_iteration):
+                G=np.sqrt(G_low*G_high)
+                tmp1=self.material_balance(G)<0
+                G_low=np.where(tmp1,G,G_low)
+                G_high=np.where(tmp1,G_high,G)
+                if np.all(G_high[bracket]/G_low[bracket]-1<tolerance):
+                    break
+            G=np.where(bracket,np.sqrt(G_low*G_high),np.nan)
+        
+        self.G=G
+        self.B=self.nucleation(G)
+        self.n=self.B/G
+        self.MT2=self.slurry_concentration(G)
+        self.C1=self.n
+        self.C2=self.C1*np.exp(-self.Lf/self.tau/self.G*(self.R-1))
+        self.C3=self.C2*np.exp(-self.Lp/self.tau/self.G*(1-self.z))
+    
+    def result(self):
+        """
+        Export the solved configurations as variables, which can be exported by variable_output
+        
+        :return: swept parameters, growth rate, nucleation rate, n0 and MT2
+        :rtype: list
+        """
+        
+        output=[]
+        for attribute,name,unit in setting_list:
+            output.append(variable(name,unit,getattr(self,attribute).ravel()))
+        output.append(variable("growth rate","um/min",self.G.ravel()))
+        output.append(variable("nucleation rate","1/(um^3*min)",self.B.ravel()))
+        output.append(variable("n0","1/um^4",self.n.ravel()))
+        output.append(variable("MT2","kg/m3",self.MT2.ravel()))
+        return output
@@ -0,0 +1,210 @@
+from sweep import *
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from scipy.stats import qmc, norm
+
+def parameter_sample(distribution,sample_number,method="lhs",seed=None):
+    """
+    Sample the parameter distributions by Latin hypercube or Sobol sequence
+    
+    :param distribution: [type, a, b] of each parameter keyed by the attribute name in setting_list. type is "uniform" (a=lower, b=upper), "loguniform" (a=lower, b=upper) or "normal" (a=mean, b=std)
+    :type distribution: dict
+    :param sample_number: number of samples
+    :type sample_number: int
+    :param method: "lhs" or "sobol"
+    :type method: string
+    :param seed: random seed
+    :type seed: int
+    :return: sampled value array of each parameter
+    :rtype: dict
+    """
+    
+    name_list=list(distribution.keys())
+    if method=="lhs":
+        sampler=qmc.LatinHypercube(d=len(name_list),seed=seed)
+    elif method=="sobol":
+        sampler=qmc.Sobol(d=len(name_list),scramble=True,seed=seed)
+    else:
+        raise ValueError("method should be lhs or sobol")
+    unit_sample=sampler.random(sample_number)
+    return parameter_transform(distribution,unit_sample)
+
+def parameter_transform(distribution,unit_sample):
+    """
+    Transform the samples in the unit hypercube to the parameter distributions
+    
+    :param distribution: [type, a, b] of each parameter, see parameter_sample
+    :type distribution: dict
+    :param unit_sample: samples in [0,1), one column per parameter in the order of distribution
+    :type unit_sample: narray
+    :return: sampled value array of each parameter
+    :rtype: dict
+    """
+    
+    name_list=list(distribution.keys())
+    output={}
+    for k in range(len(name_list)):
+        type,a,b=distribution[name_list[k]]
+        u=unit_sample[:,k]
+        if type=="uniform":
+            output[name_list[k]]=a+u*(b-a)
+        elif type=="loguniform":
+            output[name_list[k]]=10**(np.log10(a)+u*(np.log10(b)-np.log10(a)))
+        elif type=="normal":
+            output[name_list[k]]=norm.ppf(u,loc=a,scale=b)
+        else:
+            raise ValueError("distribution type should be uniform, loguniform or normal")
+    return output
+
+def sample_evaluate(parameters,base,size_edge=None):
+    """
+    Solve a chunk of samples with crystal_sweep and calculate their product metrics
+    
+    :param parameters: sampled value array of each parameter
+    :type parameters: dict
+    :param base: crystal that provides the parameters not sampled
+    :type base: crystal
+    :param size_edge: edges of the size bins of the volume CSD (um). If None, the CSD is not calculated
+    :type size_edge: narray
+    :return: G, B, L10, L50, L90 (volume based) and CV (%) of each sample, and the volume fraction of each size bin
+    :rtype: narray
+    """
+    
+    tmp1={}
+    for x in parameters:
+        tmp1[x]=np.asarray(parameters[x])[:,None]
+    tmp2=crystal_sweep(tmp1,base)
+    tmp2.solve()
+    with np.errstate(over="ignore",invalid="ignore",divide="ignore"):
+        metric=np.column_stack([tmp2.G[:,0],tmp2.B[:,0],tmp2.size_quantile(0.1)[:,0],tmp2.size_quantile(0.5)[:,0],tmp2.size_quantile(0.9)[:,0],tmp2.size_statistics("volume")[1][:,0]])
+        CSD=None
+        if size_edge is not None:
+            CSD=tmp2.moment(3,size_edge[:-1],size_edge[1:])/tmp2.moment(3)
+    return metric,CSD
+
+class streaming_percentile:
+    """
+    Approximate percentiles of many quantities from histograms on log10 scale, so the samples don't have to be kept.
+    The resolution is the bin width (0.005 in log10, about 1.2 %). Zero (and below 10^lower) is counted in the first bin, so it stays in the percentiles, and the samples that are not finite (e.g. failed solves) are counted as failed_number instead
+    """
+    
+    def __init__(self,quantity_number,lower=-40,upper=10,width=0.005):
+        """
+        :param quantity_number: number of quantities
+        :type quantity_number: int
+        :param lower: lower bound of log10 of the values
+        :type lower: float
+        :param upper: upper bound of log10 of the values
+        :type upper: float
+        :param width: bin width in log10
+        :type width: float
+        """
+        
+        self.edge=np.arange(lower,upper+width/2,width)
+        self.count=np.zeros((quantity_number,len(self.edge)+1),dtype=np.int64)
+        self.sample_number=0
+        self.failed_number=0 # samples with any value not finite
+    
+    def update(self,value):
+        """
+        Add the samples
+        
+        :param value: values, one row per sample and one column per quantity. Non-positive values are counted as zero, and values that are not finite are left out of the histograms
+        :type value: narray
+        """
+        
+        value=np.asarray(value,dtype=float)
+        valid=np.isfinite(value)
+        index=np.searchsorted(self.edge,np.log10(np.where(valid & (value>0),value,1)))
+        index=np.where(value>0,index,0)
+        quantity=np.broadcast_to(np.arange(value.shape[1]),value.shape)
+        np.add.at(self.count,(quantity[valid],index[valid]),1)
+        self.sample_number=self.sample_number+value.shape[0]
+        self.failed_number=self.failed_number+int(np.sum(~np.all(valid,axis=1)))
+    
+    def percentile(self,q):
+        """
+        Percentile of each quantity. 0 is returned if the percentile falls in the first bin
+        
+        :param q: percentile (0-100)
+        :type q: float
+        :return: percentile of each quantity
+        :rtype: narray
+        """
+        
+        cumulative=np.cumsum(self.count,axis=1)
+        total=cumulative[:,-1]
+        output=np.full(len(total),np.nan)
+        for k in range(len(total)):
+            if total[k]==0:
+                continue
+            # linear interpolation inside the bin
+            target=q/100*total[k]
+            index=min(int(np.searchsorted(cumulative[k],target,side="left")),len(self.edge)-1)
+            if index==0 and self.count[k][0]>0:
+                output[k]=0
+                continue
+            index=max(index,1)
+            previous=cumulative[k][index-1]
+            tmp1=(target-previous)/self.count[k][index] if self.count[k][index]!=0 else 0
+            output[k]=10**(self.edge[index-1]+tmp1*(self.edge[index]-self.edge[index-1]))
+        return output
+
+def propagate(base,distribution,sample_number,size_edge,percentile_list=[5,50,95],method="lhs",chunk_size=1000,worker_number=None,seed=None):
+    """
+    Monte Carlo uncertainty propagation. The samples are solved chunk by chunk in a process pool, and the percentile bands are updated and yielded after every chunk in the order the chunks finish.
+    At most two chunks per worker are in flight, so the CSDs of the samples are never kept together even if the consumer is slower than the workers
+    
+    :param base: crystal that provides the parameters not sampled
+    :type base: crystal
+    :param distribution: distribution of each parameter, see parameter_sample
+    :type distribution: dict
+    :param sample_number: number of samples
+    :type sample_number: int
+    :param size_edge: edges of the size bins of the volume CSD band (um)
+    :type size_edge: narray
+    :param percentile_list: percentiles of the bands
+    :type percentile_list: list
+    :param method: "lhs" or "sobol"
+    :type method: string
+    :param chunk_size: number of samples solved in one task
+    :type chunk_size: int
+    :param worker_number: number of worker processes. If None, the number of CPUs is used
+    :type worker_number: int
+    :param seed: random seed
+    :type seed: int
+    :return: number of solved samples, number of failed samples (not converged, left out of the bands), percentile bands of the metrics and percentile bands of the CSD
+    :rtype: generator
+    """
+    
+    size_edge=np.asarray(size_edge,dtype=float)
+    sample=parameter_sample(distribution,sample_number,method,seed)
+    chunk_list=[]
+    for start in range(0,sample_number,chunk_size):
+        chunk_list.append({x:sample[x][start:start+chunk_size] for x in sample})
+    
+    metric_percentile=streaming_percentile(6)
+    CSD_percentile=streaming_percentile(len(size_edge)-1)
+    name_list=[["growth rate","um/min"],["nucleation rate","1/(um^3*min)"],["L10","um"],["L50","um"],["L90","um"],["CV","%"]]
+    window=2*(worker_number or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=worker_number) as executor:
+        pending=set()
+        index=0
+        while index<len(chunk_list) or len(pending)>0:
+            while index<len(chunk_list) and len(pending)<window:
+                pending.add(executor.submit(sample_evaluate,chunk_list[index],base,size_edge))
+                index=index+1
+            done,pending=wait(pending,return_when=FIRST_COMPLETED)
+            for future in done:
+                metric,CSD=future.result()
+                metric_percentile.update(metric)
+                CSD_percentile.update(CSD)
+            
+                metric_band=[variable("percentile","%",np.array(percentile_list,dtype=float))]
+                tmp1=np.array([metric_percentile.percentile(q) for q in percentile_list])
+                for k in range(len(name_list)):
+                    metric_band.append(variable(name_list[k][0],name_list[k][1],tmp1[:,k]))
+                CSD_band=[variable("size","$\\mu m$",(size_edge[:-1]+size_edge[1:])/2)]
+                for q in percentile_list:
+                    CSD_band.append(variable("volume fraction (P"+str(q)+")","-",CSD_percentile.percentile(q)))
+                yield metric_percentile.sample_number,metric_percentile.failed_number,metric_band,CSD_band
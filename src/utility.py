@@ -3,6 +3,38 @@ from scipy.integrate import quad, odeint
 from data import *
 from figure import *
 
+def interpolate(x_list,y_list,x_coordinate):
+    """
+    Linear interpolation of the discretized PDF at an array of x coordinates. The bracket of each point is located by binary search, and the points outside x_list are clamped to the end values
+    
+    :param x_list: crystal size in ascending order (um)
+    :type x_list: list
+    :param y_list: density function (1/um^4)
+    :type y_list: list
+    :param x_coordinate: x coordinates (um)
+    :type x_coordinate: narray
+    :return: y coordinates (1/um^4)
+    :rtype: narray
+    """
+    
+    x_list=np.asarray(x_list,dtype=float)
+    y_list=np.asarray(y_list,dtype=float)
+    x_coordinate=np.asarray(x_coordinate,dtype=float)
+    
+    # the last bracket is taken for the duplicated points (e.g. section boundary of the PDF)
+    index=np.searchsorted(x_list,x_coordinate,side="right")-1
+    index=np.clip(index,0,len(x_list)-2)
+    x1=x_list[index]
+    x2=x_list[index+1]
+    y1=y_list[index]
+    y2=y_list[index+1]
+    with np.errstate(divide="ignore",invalid="ignore"):
+        y_coordinate=y1*(x2-x_coordinate)/(x2-x1)+y2*(x_coordinate-x1)/(x2-x1)
+    y_coordinate=np.where(x_coordinate<x_list[0],y_list[0],y_coordinate)
+    y_coordinate=np.where(x_coordinate>=x_list[-1],y_list[-1],y_coordinate)
+    
+    return y_coordinate
+
 def transform(x_list,y_list,x_coordinate):
     """
     Transform the discretized PDF to continuous PDF, which makes it easier to integrate
@@ -17,18 +49,7 @@ def transform(x_list,y_list,x_coordinate):
     :rtype: float
     """
     
-    y_coordinate=0.0
-    if x_coordinate < x_list[0]:
-        y_coordinate=y_list[0]
-    elif x_coordinate > x_list[-1]:
-        y_coordinate=y_list[-1]
-    for i in range(len(x_list)-1):
-        if x_coordinate == x_list[i]:
-            y_coordinate=y_list[i]
-        elif x_coordinate > x_list[i] and x_coordinate < x_list[i+1]:
-            y_coordinate=y_list[i]*(x_list[i+1]-x_coordinate)/(x_list[i+1]-x_list[i])+y_list[i+1]*(x_coordinate-x_list[i])/(x_list[i+1]-x_list[i])
-        elif x_coordinate == x_list[i+1]:
-            y_coordinate=y_list[i+1]
+    y_coordinate=float(interpolate(x_list,y_list,x_coordinate))
     
     return y_coordinate
 
@@ -46,13 +67,84 @@ def moment_calculation(size,density_function,order):
     :rtype: float 
     """
     
-    x_list=size
-    y_list=density_function
-    continuous_function=lambda x: transform(x_list,y_list,x)*x**order
+    x_list=np.asarray(size,dtype=float)
+    y_list=np.asarray(density_function,dtype=float)
+    continuous_function=lambda x: float(interpolate(x_list,y_list,x))*x**order
     output=quad(continuous_function,size[0],size[-1])[0]
     
     return output
 
+def DF_to_NF_array(size,density_function,mesh_size,out=None):
+    """
+    Transform the number density function to number fraction on arrays
+    
+    :param size: crystal size (um)
+    :type size: narray
+    :param density_function: number density function (1/um^4)
+    :type density_function: narray
+    :param mesh_size: mesh size of the size distribution (um)
+    :type mesh_size: float
+    :param out: buffer for the number fraction, one element shorter than the size mesh
+    :type out: narray
+    :return: mean size of each mesh (um) and number fraction
+    :rtype: narray
+    """
+    
+    mesh_number=int((size[-1]-size[0])/mesh_size)+1
+    tmp1=np.linspace(size[0],size[-1],mesh_number)
+    normalization_constant=moment_calculation(size,density_function,0)
+    
+    # interpolate every mesh point once, the interior points are shared by two neighboring meshes
+    f=interpolate(size,density_function,tmp1)
+    L_mean=(tmp1[:-1]+tmp1[1:])/2
+    number_fraction=np.add(f[:-1],f[1:],out=out)
+    number_fraction/=2
+    number_fraction*=mesh_size
+    number_fraction/=normalization_constant
+    
+    return L_mean,number_fraction
+
+def NF_to_VF_array(size,number_fraction,out=None):
+    """
+    Transform the number fraction to volume fraction on arrays. out=number_fraction converts in place
+    
+    :param size: crystal size (um)
+    :type size: narray
+    :param number_fraction: number fraction
+    :type number_fraction: narray
+    :param out: buffer for the volume fraction
+    :type out: narray
+    :return: volume fraction
+    :rtype: narray
+    """
+    
+    # float_power and cumsum give the same rounding as size**3 and the sequential sum of python floats
+    volume_fraction=np.multiply(np.float_power(size,3),number_fraction,out=out)
+    total_volume=np.cumsum(volume_fraction)[-1]
+    volume_fraction/=total_volume
+    
+    return volume_fraction
+
+def VF_to_NF_array(size,volume_fraction,out=None):
+    """
+    Transform the volume fraction to number fraction on arrays. out=volume_fraction converts in place
+    
+    :param size: crystal size (um)
+    :type size: narray
+    :param volume_fraction: volume fraction
+    :type volume_fraction: narray
+    :param out: buffer for the number fraction
+    :type out: narray
+    :return: number fraction
+    :rtype: narray
+    """
+    
+    number_fraction=np.divide(volume_fraction,np.float_power(size,3),out=out)
+    total_number=np.cumsum(number_fraction)[-1]
+    number_fraction/=total_number
+    
+    return number_fraction
+
 def DF_to_NF(size,density_function,mesh_size):
     """
     Transform the number density function to number fraction
@@ -67,20 +159,9 @@ def DF_to_NF(size,density_function,mesh_size):
     :rtype: variable
     """
     
-    size_output=variable("size","$\mu m$",[])
-    number_fraction=variable("number fraction","-",[])
-    
-    mesh_number=int((size.value[-1]-size.value[0])/mesh_size)+1
-    tmp1=np.linspace(size.value[0],size.value[-1],mesh_number)
-    normalization_constant=moment_calculation(size.value,density_function.value,0)
-    
-    for i in range(len(tmp1)-1):
-        L_mean=(tmp1[i]+tmp1[i+1])/2
-        f1=transform(size.value,density_function.value,tmp1[i])
-        f2=transform(size.value,density_function.value,tmp1[i+1])
-        tmp2=(f1+f2)/2*mesh_size/normalization_constant
-        size_output.value.append(L_mean)
-        number_fraction.value.append(tmp2)
+    L_mean,tmp1=DF_to_NF_array(np.asarray(size.value,dtype=float),np.asarray(density_function.value,dtype=float),mesh_size)
+    size_output=variable("size","$\mu m$",L_mean)
+    number_fraction=variable("number fraction","-",tmp1)
         
     return size_output, number_fraction
 
@@ -96,15 +177,8 @@ def NF_to_VF(size,number_fraction):
     :rtype: variable
     """
     
-    volume_fraction=variable("volume fraction","-",[])
-    
-    total_volume=0
-    for i in range(len(size.value)):
-        tmp1=size.value[i]**3*number_fraction.value[i]
-        total_volume=total_volume+tmp1
-    for i in range(len(size.value)):
-        tmp1=size.value[i]**3*number_fraction.value[i]
-        volume_fraction.value.append(tmp1/total_volume)    
+    tmp1=NF_to_VF_array(np.asarray(size.value,dtype=float),np.asarray(number_fraction.value,dtype=float))
+    volume_fraction=variable("volume fraction","-",tmp1)
     
     return size,volume_fraction
 
@@ -120,15 +194,8 @@ def VF_to_NF(size,volume_fraction):
     :rtype: variable
     """
     
-    number_fraction=variable("number fraction","-",[])
-    
-    total_number=0
-    for i in range(len(size.value)):
-        tmp1=volume_fraction.value[i]/size.value[i]**3
-        total_number=total_number+tmp1
-    for i in range(len(size.value)):
-        tmp1=volume_fraction.value[i]/size.value[i]**3
-        number_fraction.value.append(tmp1/total_number)    
+    tmp1=VF_to_NF_array(np.asarray(size.value,dtype=float),np.asarray(volume_fraction.value,dtype=float))
+    number_fraction=variable("number fraction","-",tmp1)
     
     return size,number_fraction
 